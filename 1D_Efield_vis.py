@@ -1,5 +1,18 @@
+from functools import partial
+
 import numpy as np
-import plotly.graph_objects as go
+
+from fieldsim.field_cube import create_cube
+from fieldsim.figure_dicts import TraceTemplate, segment_colors
+from fieldsim.mode_animation import (
+    ArrowTraces,
+    animation_controls,
+    animation_frames,
+    field_chunks,
+    write_animation,
+)
+from fieldsim.modes import ModeSet, animation_period, plan_frames
+from fieldsim.result_cache import ResultCache
 
 # --- Parameters ---
 c = 1.0  # wave speed
@@ -41,30 +54,16 @@ phase_amps = [i / norm for i in phase_amps]
 A_k = {(k, pol): amp for k, pol, amp in zip(k_values, polarizations, phase_amps)}
 
 # Animation time settings
-num_frames = 100
-# Set duration to one whole cycle of the slowest beat (difference frequency)
-try:
-
-    if len(k_values) > 1:
-        omegas = [c * abs(k) for k in k_values]
-
-        # Search smallest difference
-        maxm = 1000000
-        min_pair = None
-
-        # Check all pairs
-        for a in omegas:
-            if a < maxm:
-                maxm = a
-        print(maxm)
-
-        beat_period = 2 * np.pi / maxm
-        print(beat_period)
-        t_vals = np.linspace(0, beat_period, num_frames)
-    else:
-        t_vals = np.linspace(0, 2 * np.pi, num_frames)
-except:
-    t_vals = np.linspace(0, 2 * np.pi, num_frames)
+# One loop is the common period of all modes, or the slowest beat if that's too
+# long (see modes.py). The number of frames follows from sampling the fastest
+# mode frames_per_cycle times per oscillation. If that's more than max_frames,
+# fewer cycles of the fastest mode are animated rather than undersampling it.
+frames_per_cycle = 24
+min_frames, max_frames = 100, 2000
+omegas = [c * abs(k) for k in k_values]
+period = animation_period(omegas)
+num_frames, span = plan_frames(omegas, period, frames_per_cycle, min_frames, max_frames)
+t_vals = np.linspace(0, span, num_frames, endpoint=False)
 
 step = 1
 x_plot = x[::step]
@@ -73,194 +72,186 @@ y0 = np.zeros_like(x0)
 z0 = np.zeros_like(x0)
 scale = 1.0
 
-# Precompute all frames
-frames = []
-for t in t_vals:
-    # Compute vector components with polarization
-    v = np.zeros_like(x_plot)
-    w = np.zeros_like(x_plot)
-    mode_lines = []
-    for idx, (k, pol) in enumerate(zip(k_values, polarizations)):
-        py, pz = pol
-        omega = c * abs(k)
-        alpha = A_k[(k, pol)] * np.exp(-1j * omega * t)
-        E_mode = (
-            alpha * np.exp(1j * k * x_plot) + np.conj(alpha * np.exp(1j * k * x_plot))
-        ).real
-        v += E_mode * py
-        w += E_mode * pz
+# Write the HTML with binary frame buffers (see html_export.py) instead of
+# Plotly's per-frame JSON. Much smaller and quicker to write and load.
+compact_html = True
 
-        # Draw the field component for this mode at all x (translucent)
-        x_heads_mode = x0
-        y_heads_mode = y0 + scale * E_mode * py
-        z_heads_mode = z0 + scale * E_mode * pz
+# How many frames are evaluated at once (and held at once when streaming)
+frame_window = 16
+# Processes evaluating the frame chunks, and chunks handed to a process per task
+workers = 1
+chunksize = 1
+# Stream frames straight into the HTML file instead of building the whole
+# figure in memory first. Skips fig.show(), open the HTML file instead.
+stream_frames = False
+# np.complex64 evaluates the modes in single precision, plenty for display
+mode_dtype = np.complex128
+# "auto" synthesizes the field with an inverse FFT when the k's fit the grid
+# (see modes.py) and that beats summing the modes, "direct" always sums them
+mode_method = "auto"
+# Draw all mode arrows of a frame as one trace (gaps between the segments)
+# instead of one trace per mode. Keeps frames small with many modes.
+batch_arrows = True
+# Directory to also save the (y, z) field of every frame in, with the grid,
+# times and mode parameters (see field_cube.py). None to skip.
+cube_to = None
+# Cache for the computed fields and the rendered HTML (see result_cache.py).
+# Reruns with the same parameters reuse both, styling changes only redo the
+# figure. None to always recompute.
+cache_dir = ".field_cache"
+cache_size = 2 * 1024**3
 
-    x_heads = []
-    y_heads = []
-    z_heads = []
-    line_segments = []
-    line_segments.extend(mode_lines)
-    for xi, yi, zi, vi, wi in zip(x0, y0, z0, v, w):
-        x_head = xi
-        y_head = yi + scale * vi
-        z_head = zi + scale * wi
-        x_heads.append(x_head)
-        y_heads.append(y_head)
-        z_heads.append(z_head)
-        # line_segments.append(
-        #     go.Scatter3d(
-        #         x=[xi, x_head],
-        #         y=[yi, y_head],
-        #         z=[zi, z_head],
-        #         mode="lines",
-        #         line=dict(color="magenta", width=4),
-        #         showlegend=False,
-        #     )
-        # )
 
-    # Add a line connecting all the vector heads (total field)
-    line_segments.append(
-        go.Scatter3d(
-            x=x_heads,
-            y=y_heads,
-            z=z_heads,
+def main():
+    import plotly.graph_objects as go
+
+    # Trace styles, validated by Plotly once. The frames are plain dicts built from
+    # them (see figure_dicts.py)
+    tip_trace = TraceTemplate(
+        go.Scatter3d,
+        mode="lines",
+        line=dict(color="blue", width=3),
+        name="Field tip trace",
+        showlegend=False,
+    )
+    mode_colors = ["red", "green", "orange", "magenta", "cyan"]
+    mode_arrow = [
+        TraceTemplate(
+            go.Scatter3d,
             mode="lines",
-            line=dict(color="blue", width=3),
-            name="Field tip trace",
+            line=dict(color=color, width=4),
             showlegend=False,
         )
+        for color in mode_colors
+    ]
+    mode_arrows_batch = TraceTemplate(
+        go.Scatter3d,
+        mode="lines",
+        line=dict(width=4, **segment_colors(mode_colors, len(k_values))),
+        showlegend=False,
+    )
+    total_arrow = TraceTemplate(
+        go.Scatter3d,
+        mode="lines",
+        line=dict(color="magenta", width=4),
+        showlegend=False,
+    )
+    # A line segment at x0[0] for each individual mode and the total field
+    arrows = ArrowTraces(
+        (x0[0], y0[0], z0[0]),
+        scale,
+        total_arrow,
+        mode=mode_arrow,
+        batch=mode_arrows_batch if batch_arrows else None,
     )
 
-    # Add a line segment at x0[0] for each individual mode
-    for idx, (k, pol) in enumerate(zip(k_values, polarizations)):
-        py, pz = pol
-        omega = c * abs(k)
-        alpha = A_k[(k, pol)] * np.exp(-1j * omega * t)
-        E_mode = (
-            alpha * np.exp(1j * k * x0[0]) + np.conj(alpha * np.exp(1j * k * x0[0]))
-        ).real
-        vi_mode = E_mode * py
-        wi_mode = E_mode * pz
-        x_head = x0[0]
-        y_head = y0[0] + scale * vi_mode
-        z_head = z0[0] + scale * wi_mode
-        line_segments.append(
-            go.Scatter3d(
-                x=[x0[0], x_head],
-                y=[y0[0], y_head],
-                z=[z0[0], z_head],
-                mode="lines",
-                line=dict(
-                    color=["red", "green", "orange", "magenta", "cyan"][idx % 5],
-                    width=4,
-                ),
-                showlegend=False,
-            )
+    def traces(field, mode_arrows):
+        v = field[:, 0]
+        w = field[:, 1]
+        # A line connecting all the vector heads (total field), as whole arrays
+        tip = tip_trace(x=x0, y=y0 + scale * v, z=z0 + scale * w)
+        return [tip] + arrows(mode_arrows, field[0])
+
+    amps = [A_k[(k, pol)] for k, pol in zip(k_values, polarizations)]
+    cache = ResultCache(cache_dir, cache_size, source=__file__) if cache_dir else None
+    physics_key = None
+    if cache is not None:
+        # Everything the field values depend on
+        physics_key = cache.key(
+            "polarization_fields",
+            c=c,
+            x=x_plot,
+            t=t_vals,
+            k_values=k_values,
+            polarizations=polarizations,
+            amps=amps,
+            dtype=mode_dtype,
+            method=mode_method,
         )
-    total_line_segments = []
-    x_head = x0[0]
-    y_head = y0[0] + scale * v[0]
-    z_head = z0[0] + scale * w[0]
-    total_line_segments.append(
-        go.Scatter3d(
-            x=[x0[0], x_head],
-            y=[y0[0], y_head],
-            z=[z0[0], z_head],
-            mode="lines",
-            line=dict(color="magenta", width=4),
-            showlegend=False,
+
+    def generate_frames():
+        """Yield one frame dict per time step, evaluating frame_window at a time."""
+        modes = partial(
+            ModeSet.plane_waves,
+            k_values,
+            x_plot,
+            polarizations,
+            amps,
+            c=c,
+            dtype=mode_dtype,
+            method=mode_method,
         )
-    )
-    line_segments.extend(total_line_segments)
-    frames.append(go.Frame(data=line_segments, name=f"{t:.2f}"))
+        chunks = field_chunks(
+            modes, t_vals, frame_window, workers, chunksize, cache, physics_key
+        )
+        cube = None
+        if cube_to:
+            cube = create_cube(
+                cube_to,
+                (len(t_vals), len(x_plot), 2),
+                ("t", "x", "component"),
+                coords=dict(t=t_vals, x=x_plot, component=["y", "z"]),
+                dtype=np.finfo(mode_dtype).dtype,
+                c=c,
+                k_values=k_values,
+                polarizations=polarizations,
+                phase_amps=phase_amps,
+            )
+        return animation_frames(chunks, t_vals, traces, cube=cube)
 
-x_range = [0, 4 * np.pi]
-y_range = [-4, 4]
-z_range = [-4, 4]
-# Initial frame
-init_data = frames[0].data
+    x_range = [0, 4 * np.pi]
+    y_range = [-4, 4]
+    z_range = [-4, 4]
+    layout = dict(
+        scene=dict(
+            xaxis_title="x",
+            yaxis_title="Re[E(x,t)]",
+            zaxis_title="Field vector",
+            xaxis=dict(range=x_range, color="white", autorange=False),
+            yaxis=dict(range=y_range, color="white", autorange=False),
+            zaxis=dict(range=z_range, color="white", autorange=False),
+            bgcolor="rgb(20,20,30)",
+            aspectmode="cube",  # <-- Add this line to keep aspect ratio fixed
+        ),
+        title="1D Electric Field Vectors (Plotly, lines/arrows, animated)",
+        margin=dict(l=0, r=0, b=0, t=40),
+        showlegend=False,
+        paper_bgcolor="rgb(10,10,15)",
+        font=dict(color="white"),
+        **animation_controls(t_vals),
+    )
 
-fig = go.Figure(
-    data=init_data,
-    frames=frames,
-)
+    output = "Efield_plot_animated.html"
+    render_key = None
+    if cache is not None:
+        # The physics plus everything that changes the look of the page
+        render_key = cache.key(
+            physics_key,
+            layout=layout,
+            # Frame coordinates: the arrow origins and their scale
+            scale=scale,
+            origins=(x0, y0, z0),
+            tip_trace=tip_trace.static,
+            arrows=arrows.static(),
+            compact_html=compact_html,
+            stream_frames=stream_frames,
+        )
+    write_animation(
+        output,
+        layout,
+        generate_frames,
+        cache=cache,
+        key=render_key,
+        stream=stream_frames,
+        compact=compact_html,
+        window=frame_window,
+        # A saved cube needs the fields, so only reuse the page without one
+        reuse=not cube_to,
+    )
+    print(
+        "Plot saved as Efield_plot_animated.html. Open this file in your browser to view the animation."
+    )
 
-fig.update_layout(
-    scene=dict(
-        xaxis_title="x",
-        yaxis_title="Re[E(x,t)]",
-        zaxis_title="Field vector",
-        xaxis=dict(range=x_range, color="white", autorange=False),
-        yaxis=dict(range=y_range, color="white", autorange=False),
-        zaxis=dict(range=z_range, color="white", autorange=False),
-        bgcolor="rgb(20,20,30)",
-        aspectmode="cube",  # <-- Add this line to keep aspect ratio fixed
-    ),
-    title="1D Electric Field Vectors (Plotly, lines/arrows, animated)",
-    margin=dict(l=0, r=0, b=0, t=40),
-    showlegend=False,
-    paper_bgcolor="rgb(10,10,15)",
-    font=dict(color="white"),
-    updatemenus=[
-        {
-            "type": "buttons",
-            "buttons": [
-                {
-                    "label": "Play",
-                    "method": "animate",
-                    "args": [
-                        None,
-                        {
-                            "frame": {"duration": 60, "redraw": True},
-                            "fromcurrent": True,
-                        },
-                    ],
-                },
-                {
-                    "label": "Pause",
-                    "method": "animate",
-                    "args": [
-                        [None],
-                        {
-                            "frame": {"duration": 0, "redraw": False},
-                            "mode": "immediate",
-                        },
-                    ],
-                },
-            ],
-            "direction": "left",
-            "pad": {"r": 10, "t": 87},
-            "showactive": False,
-            "x": 0.1,
-            "xanchor": "right",
-            "y": 0,
-            "yanchor": "top",
-        }
-    ],
-    sliders=[
-        {
-            "steps": [
-                {
-                    "args": [
-                        [f"{t:.2f}"],
-                        {"frame": {"duration": 0, "redraw": True}, "mode": "immediate"},
-                    ],
-                    "label": f"{i}",
-                    "method": "animate",
-                }
-                for i, t in enumerate(t_vals)
-            ],
-            "transition": {"duration": 0},
-            "x": 0.1,
-            "len": 0.9,
-            "currentvalue": {"prefix": "Frame: "},
-            "pad": {"b": 10, "t": 60},
-        }
-    ],
-)
 
-fig.show()
-fig.write_html("Efield_plot_animated.html")
-print(
-    "Plot saved as Efield_plot_animated.html. Open this file in your browser to view the animation."
-)
+if __name__ == "__main__":
+    main()
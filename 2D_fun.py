@@ -1,76 +1,195 @@
+from functools import partial
+
 import numpy as np
-import plotly.graph_objects as go
+
+from fieldsim import profiling
+from fieldsim.field_cube import create_cube
+from fieldsim.figure_dicts import TraceTemplate, figure, frame_dict, show
+from fieldsim.frame_pool import map_frames
+from fieldsim.html_export import CompactHTMLWriter
+from fieldsim.profiling import stage, timed
+from fieldsim.raw_video import Canvas, FFmpegPipe, colormap_lut
+from fieldsim.result_cache import ResultCache, store_chunks
+from fieldsim.retarded_field import radiation_field, radiation_field_tiled
+from fieldsim.trajectory import Circle
 
 ### Also just copilot but damn
 
 
-def simulate_2d_current_and_waves():
+def simulate_2d_current_and_waves(
+    stream_to=None,
+    frame_window=8,
+    workers=1,
+    chunksize=4,
+    video_to=None,
+    video_size=1080,
+    video_fps=30,
+    grid_size=200,
+    tile=None,
+    field_dtype=np.float64,
+    cube_to=None,
+    cache_dir=".field_cache",
+    cache_size=2 * 1024**3,
+    trajectory=None,
+    num_frames=80,
+    method="approx",
+):
     """
     Simulate the wave generated by a point charge moving in a circle in 2D.
     Visualize the resulting wave propagation using a simple retarded potential approach.
+
+    With stream_to set to a file name the frames are written into a compact HTML
+    file (see html_export.py) as they are computed, instead of being collected for
+    fig.show(). At most frame_window frames are held in memory then.
+    With workers > 1 the fields are computed in a process pool, chunksize frames
+    per task (see frame_pool.py). The frames come out the same either way.
+    video_to renders an MP4 instead, without Plotly: every field is rasterized into
+    a video_size x video_size RGB buffer and piped to ffmpeg (see raw_video.py).
+    grid_size is the number of grid points per axis. With tile set the field is
+    evaluated in tile x tile blocks with fixed scratch buffers of field_dtype, so
+    memory stays bounded for big grids (see radiation_field_tiled).
+    cube_to is a directory to also save the raw (T, Ny, Nx) field series in, with
+    the grid, times and parameters, to be reopened with field_cube.open_cube().
+    Fields and the HTML/MP4 outputs are cached in cache_dir (see result_cache.py):
+    a rerun with the same parameters copies the output, one with only a different
+    look skips the physics. cache_dir=None always recomputes.
+    To compare many r0, w0, q, c without plotting, see fieldsim/sweep.py.
+    trajectory is another path of the charge than the circle, e.g. a
+    TrajectoryTable of a measured path (see trajectory.py). Fields of a
+    FunctionTrajectory aren't cached, it has no key.
+    num_frames is the number of frames over t = 0..6. method solves the retarded
+    time: "approx" (one step, t' = t - |r - r'(t)|/c) or the exact solution of
+    t' = t - |r - r'(t')|/c via "newton" or "fixed_point".
     """
     # Grid
-    x = np.linspace(-10, 10, 200)
-    y = np.linspace(-10, 10, 200)
+    x = np.linspace(-10, 10, grid_size)
+    y = np.linspace(-10, 10, grid_size)
     X, Y = np.meshgrid(x, y)
-    frames = []
     c = 1.0  # wave speed
 
-    # Particle trajectory: circle of radius r0, angular frequency w0
-    r0 = 1.5
-    w0 = 2.0
+    # Particle trajectory, by default a circle of radius r0, angular frequency w0
+    if trajectory is None:
+        trajectory = Circle(r0=1.5, w0=2.0)
     q = 1.0  # charge
 
-    def particle_pos(t):
-        return r0 * np.cos(w0 * t), r0 * np.sin(w0 * t)
-
-    t_vals = np.linspace(0, 6, 80)
-    for i, t in enumerate(t_vals):
-        # For each grid point, compute retarded time and source position
-        R = np.zeros_like(X)
-        E = np.zeros_like(X)
-        for ix in range(X.shape[0]):
-            for iy in range(X.shape[1]):
-                xg, yg = X[ix, iy], Y[ix, iy]
-                # Find retarded time: t' = t - |r - r'(t')|/c
-                # Approximate: use t' = t - |r - r'(t)|/c (non-iterative, for visualization)
-                xp, yp = particle_pos(t)
-                dx = xg - xp
-                dy = yg - yp
-                r_dist = np.sqrt(dx**2 + dy**2)
-                tret = t - r_dist / c
-                # Particle position at retarded time
-                xpr, ypr = particle_pos(tret)
-                dxr = xg - xpr
-                dyr = yg - ypr
-                r_retdist = np.sqrt(dxr**2 + dyr**2)
-                # Simple radiated field: proportional to acceleration, 1/r falloff
-                # For circular motion, acceleration is towards center: a = w0^2 * r0
-                ax = -(w0**2) * xpr
-                ay = -(w0**2) * ypr
-                # Project acceleration onto direction to observer
-                r_hat_x = dxr / (r_retdist + 1e-8)
-                r_hat_y = dyr / (r_retdist + 1e-8)
-                a_proj = ax * r_hat_x + ay * r_hat_y
-                # Field: E ~ (q a_proj) / r
-                if r_retdist > 0.05:
-                    E[ix, iy] = q * a_proj / (r_retdist + 1e-8)
-                else:
-                    E[ix, iy] = 0.0
-        frames.append(
-            go.Frame(
-                data=[go.Heatmap(z=E, x=x, y=y, colorscale="Viridis", zmin=-2, zmax=2)],
-                name=f"{i}",
-            )
+    t_vals = np.linspace(0, 6, num_frames)
+
+    # Whole grid at once, or tile by tile, see retarded_field.py
+    field_args = dict(trajectory=trajectory, q=q, c=c, method=method, return_info=True)
+    if tile:
+        evaluate = partial(
+            radiation_field_tiled, X, Y, tile=tile, dtype=field_dtype, **field_args
         )
+    else:
+        evaluate = partial(radiation_field, X, Y, **field_args)
 
-    # Initial frame
-    E = frames[0].data[0].z
-    fig = go.Figure(
-        data=[go.Heatmap(z=E, x=x, y=y, colorscale="Viridis", zmin=-2, zmax=2)],
-        frames=frames,
+    cube = None
+    if cube_to:
+        cube = create_cube(
+            cube_to,
+            (len(t_vals), *X.shape),
+            ("t", "y", "x"),
+            coords=dict(t=t_vals, y=y, x=x),
+            dtype=field_dtype,
+            c=c,
+            q=q,
+            method=method,
+            # The parameters of the path, None for a FunctionTrajectory
+            trajectory=trajectory.key(),
+        )
+
+    cacheable = trajectory.key() is not None
+    cache = (
+        ResultCache(cache_dir, cache_size, source=__file__)
+        if cache_dir and cacheable
+        else None
     )
-    fig.update_layout(
+    if cache is not None:
+        # Everything the field values depend on
+        physics_key = cache.key(
+            "radiation_field",
+            x=x,
+            y=y,
+            t=t_vals,
+            c=c,
+            trajectory=trajectory.key(),
+            q=q,
+            method=method,
+            dtype=field_dtype if tile else np.float64,
+        )
+
+    def fields():
+        # (E, info) per frame, also written to the cube if there is one
+        stored = cache.load(physics_key) if cache is not None else None
+        # Tiles are evaluated straight into the memory-mapped cube, frames from
+        # the cache or from other processes are copied in
+        direct = stored is None and tile and cube is not None and workers <= 1
+        if stored is not None:
+            # Same physics as an earlier run
+            results = ((E, None) for E in stored["E"])
+        else:
+            if direct:
+                results = (evaluate(t, out=cube.data[i]) for i, t in enumerate(t_vals))
+            else:
+                results = map_frames(
+                    evaluate, t_vals, workers=workers, chunksize=chunksize
+                )
+            if cache is not None:
+                results = store_chunks(
+                    cache,
+                    physics_key,
+                    results,
+                    len(t_vals),
+                    ("E",),
+                    select=lambda result: (result[0][None],),
+                )
+        for i, (E, info) in enumerate(timed("field evaluation", results)):
+            if cube is not None and not direct:
+                cube[i] = E
+            yield E, info
+        if cube is not None:
+            cube.close()
+
+    if video_to:
+        if cache is not None:
+            render_key = cache.key(physics_key, "video", video_size, video_fps)
+            # A saved cube needs the fields, so only skip rendering without one
+            if not cube_to and cache.fetch_file(render_key, video_to):
+                return
+        frame = np.empty((video_size, video_size, 3), dtype=np.uint8)
+        canvas = Canvas(frame, (x[0], x[-1]), (y[0], y[-1]))
+        lut = colormap_lut("viridis")
+        with FFmpegPipe(video_to, video_size, video_size, fps=video_fps) as pipe:
+            for E, info in fields():
+                with stage("rasterize"):
+                    canvas.heatmap(E, -2, 2, lut)
+                pipe.write(frame)
+                profiling.frame()
+        if cache is not None:
+            cache.store_file(render_key, video_to)
+        return
+
+    import plotly.graph_objects as go
+
+    # Heatmap style validated by Plotly once, the frames are plain dicts (see
+    # figure_dicts.py)
+    heatmap = TraceTemplate(go.Heatmap, x=x, y=y, colorscale="Viridis", zmin=-2, zmax=2)
+
+    def generate_frames():
+        for i, (E, info) in enumerate(fields()):
+            if info is not None and info["converged"] < info["cells"]:
+                print(
+                    f"Frame {i}: retarded time converged in {info['converged']}/"
+                    f"{info['cells']} cells after {info['iterations']} iterations"
+                )
+            with stage("trace building"):
+                trace = heatmap(z=E)
+            with stage("frame construction"):
+                frame = frame_dict([trace], name=f"{i}")
+            profiling.frame()
+            yield frame
+
+    layout = dict(
         title="2D Wave from Circularly Moving Charge",
         xaxis_title="x",
         yaxis_title="y",
@@ -126,7 +245,7 @@ def simulate_2d_current_and_waves():
                         ],
                         label=f"{i+1}",
                     )
-                    for i in range(len(frames))
+                    for i in range(len(t_vals))
                 ],
                 active=0,
                 transition=dict(duration=0),
@@ -139,7 +258,25 @@ def simulate_2d_current_and_waves():
             )
         ],
     )
-    fig.show()
+
+    if stream_to:
+        if cache is not None:
+            render_key = cache.key(physics_key, "html", layout, heatmap.static)
+            if not cube_to and cache.fetch_file(render_key, stream_to):
+                return
+        # Each frame is written to the file and dropped right away
+        with CompactHTMLWriter(stream_to, layout=layout, window=frame_window) as out:
+            for frame in generate_frames():
+                out.add_frame(frame)
+        if cache is not None:
+            cache.store_file(render_key, stream_to)
+        return
+
+    frames = list(generate_frames())
+    # Initial frame
+    fig = figure(frames[0]["data"], layout, frames)
+    show(fig)
 
 
-simulate_2d_current_and_waves()
+if __name__ == "__main__":
+    simulate_2d_current_and_waves()
@@ -1,5 +1,16 @@
 import numpy as np
-import plotly.graph_objects as go
+
+from fieldsim.figure_dicts import TraceTemplate, segment_colors
+from fieldsim.mode_animation import (
+    ArrowTraces,
+    animation_controls,
+    animation_frames,
+    field_chunks,
+    write_animation,
+)
+from fieldsim.modes import ModeSet, animation_period, plan_frames
+from fieldsim.profiling import stage
+from fieldsim.result_cache import ResultCache
 
 # --- Parameters ---
 c = 1.0  # wave speed
@@ -16,15 +27,16 @@ polarizations = [
 ]
 
 # Animation time settings
-num_frames = 100
-# Set duration to one whole cycle of the slowest beat (difference frequency)
-if len(k_values) > 1:
-    omega1 = c * abs(k_values[0])
-    omega2 = c * abs(k_values[1])
-    beat_period = 2 * np.pi / abs(omega1 - omega2)
-    t_vals = np.linspace(0, beat_period, num_frames)
-else:
-    t_vals = np.linspace(0, 2 * np.pi, num_frames)
+# One loop is the common period of all modes, or the slowest beat if that's too
+# long (see modes.py). The number of frames follows from sampling the fastest
+# mode frames_per_cycle times per oscillation. If that's more than max_frames,
+# fewer cycles of the fastest mode are animated rather than undersampling it.
+frames_per_cycle = 24
+min_frames, max_frames = 100, 2000
+omegas = [c * abs(k) for k in k_values]
+period = animation_period(omegas)
+num_frames, span = plan_frames(omegas, period, frames_per_cycle, min_frames, max_frames)
+t_vals = np.linspace(0, span, num_frames, endpoint=False)
 
 step = 1
 x_plot = x[::step]
@@ -33,162 +45,186 @@ y0 = np.zeros_like(x0)
 z0 = np.zeros_like(x0)
 scale = 1.0
 
-# Precompute all frames
-frames = []
-for t in t_vals:
-    # Compute vector components with polarization
-    v = np.zeros_like(x_plot)
-    w = np.zeros_like(x_plot)
-    mode_heads = []
-    mode_lines = []
-    for idx, k in enumerate(k_values):
-        py, pz = polarizations[idx]
-        omega = c * abs(k)
-        alpha = A_k[k] * np.exp(-1j * omega * t)
-        E_mode = (
-            alpha * np.exp(1j * k * x_plot) + np.conj(alpha * np.exp(1j * k * x_plot))
-        ).real
-        v += E_mode * py
-        w += E_mode * pz
-
-        # Individual mode contribution at x0[0]
-        vi_mode = E_mode[0] * py
-        wi_mode = E_mode[0] * pz
-        x_head_mode = x0[0]
-        y_head_mode = y0[0] + scale * vi_mode
-        z_head_mode = z0[0] + scale * wi_mode
-        mode_heads.append((x_head_mode, y_head_mode, z_head_mode))
-        # Add line for this mode
-        mode_lines.append(
-            go.Scatter3d(
-                x=[x0[0], x_head_mode],
-                y=[y0[0], y_head_mode],
-                z=[z0[0], z_head_mode],
-                mode="lines",
-                line=dict(
-                    color=["red", "green", "orange", "magenta", "cyan"][idx % 5],
-                    width=3,
-                ),
-                name=f"Mode {idx+1}",
-                showlegend=False,
-            )
-        )
+# Write the HTML with binary frame buffers (see html_export.py) instead of
+# Plotly's per-frame JSON. Much smaller and quicker to write and load.
+compact_html = True
 
-    # Total field at x0[0]
-    x_head = x0[0]
-    y_head = y0[0] + scale * v[0]
-    z_head = z0[0] + scale * w[0]
-    # Only show the total field at x0[0]
-    line_segments = []
-    line_segments.extend(mode_lines)
-    line_segments.append(
-        go.Scatter3d(
-            x=[x0[0], x_head],
-            y=[y0[0], y_head],
-            z=[z0[0], z_head],
+# How many frames are evaluated at once (and held at once when streaming)
+frame_window = 16
+# Processes evaluating the frame chunks, and chunks handed to a process per task
+workers = 1
+chunksize = 1
+# Stream frames straight into the HTML file instead of building the whole
+# figure in memory first. Skips fig.show(), open the HTML file instead.
+stream_frames = False
+# np.complex64 evaluates the modes in single precision, plenty for display
+mode_dtype = np.complex128
+# "auto" synthesizes the field with an inverse FFT when the k's fit the grid
+# (see modes.py) and that beats summing the modes, "direct" always sums them
+mode_method = "auto"
+# Draw all mode arrows of a frame as one trace (gaps between the segments)
+# instead of one trace per mode. Keeps frames small with many modes.
+batch_arrows = True
+# Cache for the computed fields and the rendered HTML (see result_cache.py).
+# Reruns with the same parameters reuse both, styling changes only redo the
+# figure. None to always recompute.
+cache_dir = ".field_cache"
+cache_size = 2 * 1024**3
+
+
+def main():
+    import plotly.graph_objects as go
+
+    # The spatial bases are built once, each chunk of frames is then one matrix
+    # product (see modes.py)
+    modes = ModeSet.plane_waves(
+        k_values,
+        x_plot,
+        polarizations,
+        [A_k[k] for k in k_values],
+        c=c,
+        dtype=mode_dtype,
+        method=mode_method,
+    )
+
+    # Trace styles, validated by Plotly once. The frames are plain dicts built from
+    # them (see figure_dicts.py)
+    mode_colors = ["red", "green", "orange", "magenta", "cyan"]
+    mode_arrow = [
+        TraceTemplate(
+            go.Scatter3d,
             mode="lines",
-            line=dict(color="blue", width=5),
-            name="Total field",
+            line=dict(color=mode_colors[idx % 5], width=3),
+            name=f"Mode {idx+1}",
             showlegend=False,
         )
+        for idx in range(len(modes))
+    ]
+    mode_arrows_batch = TraceTemplate(
+        go.Scatter3d,
+        mode="lines",
+        line=dict(width=3, **segment_colors(mode_colors, len(modes))),
+        name="Modes",
+        showlegend=False,
+    )
+    total_arrow = TraceTemplate(
+        go.Scatter3d,
+        mode="lines",
+        line=dict(color="blue", width=5),
+        name="Total field",
+        showlegend=False,
+    )
+    # Only the mode contributions and the total field at x0[0] are shown
+    arrows = ArrowTraces(
+        (x0[0], y0[0], z0[0]),
+        scale,
+        total_arrow,
+        mode=mode_arrow,
+        batch=mode_arrows_batch if batch_arrows else None,
     )
-    frames.append(go.Frame(data=line_segments, name=f"{t:.2f}"))
-
-# Compute axis ranges to fit all frames
-all_y = []
-all_z = []
-for frame in frames:
-    for trace in frame.data:
-        if isinstance(trace, go.Scatter3d):
-            all_y.extend(trace.y)
-            all_z.extend(trace.z)
-y_range = [np.min([np.min(y0), np.min(all_y)]), np.max([np.max(y0), np.max(all_y)])]
-z_range = [np.min([np.min(z0), np.min(all_z)]), np.max([np.max(z0), np.max(all_z)])]
-x_range = [np.min(x0), np.max(x0)]
-
-# Initial frame
-init_data = frames[0].data
-
-fig = go.Figure(
-    data=init_data,
-    frames=frames,
-)
 
-fig.update_layout(
-    scene=dict(
-        xaxis_title="x",
-        yaxis_title="Re[E(x,t)]",
-        zaxis_title="Field vector",
-        xaxis=dict(range=x_range, color="white"),
-        yaxis=dict(range=y_range, color="white"),
-        zaxis=dict(range=z_range, color="white"),
-        bgcolor="rgb(20,20,30)",
-    ),
-    title="1D Electric Field Vectors (Plotly, lines/arrows, animated)",
-    margin=dict(l=0, r=0, b=0, t=40),
-    showlegend=False,
-    paper_bgcolor="rgb(10,10,15)",
-    font=dict(color="white"),
-    updatemenus=[
-        {
-            "type": "buttons",
-            "buttons": [
-                {
-                    "label": "Play",
-                    "method": "animate",
-                    "args": [
-                        None,
-                        {
-                            "frame": {"duration": 60, "redraw": True},
-                            "fromcurrent": True,
-                        },
-                    ],
-                },
-                {
-                    "label": "Pause",
-                    "method": "animate",
-                    "args": [
-                        [None],
-                        {
-                            "frame": {"duration": 0, "redraw": False},
-                            "mode": "immediate",
-                        },
-                    ],
-                },
-            ],
-            "direction": "left",
-            "pad": {"r": 10, "t": 87},
-            "showactive": False,
-            "x": 0.1,
-            "xanchor": "right",
-            "y": 0,
-            "yanchor": "top",
-        }
-    ],
-    sliders=[
-        {
-            "steps": [
-                {
-                    "args": [
-                        [f"{t:.2f}"],
-                        {"frame": {"duration": 0, "redraw": True}, "mode": "immediate"},
-                    ],
-                    "label": f"{i}",
-                    "method": "animate",
-                }
-                for i, t in enumerate(t_vals)
-            ],
-            "transition": {"duration": 0},
-            "x": 0.1,
-            "len": 0.9,
-            "currentvalue": {"prefix": "Frame: "},
-            "pad": {"b": 10, "t": 60},
+    def traces(field, mode_arrows):
+        return arrows(mode_arrows, field[0])
+
+    cache = ResultCache(cache_dir, cache_size, source=__file__) if cache_dir else None
+    physics_key = None
+    if cache is not None:
+        # Everything the field values depend on
+        physics_key = cache.key(
+            "polarization_fields",
+            c=c,
+            x=x_plot,
+            t=t_vals,
+            k_values=k_values,
+            polarizations=polarizations,
+            amps=[A_k[k] for k in k_values],
+            dtype=mode_dtype,
+            method=mode_method,
+        )
+
+    def generate_frames():
+        """Yield one frame dict per time step, evaluating frame_window at a time."""
+        chunks = field_chunks(
+            modes, t_vals, frame_window, workers, chunksize, cache, physics_key
+        )
+        return animation_frames(chunks, t_vals, traces)
+
+    def arrow_ranges(window=frame_window):
+        """
+        [min, max] y and z ranges that fit every arrow of every frame.
+
+        Only the arrows at x0[0] are drawn, so this only needs the mode
+        contributions there, a running min/max over the frame chunks. Known before
+        any frame is built.
+        """
+        ranges = {
+            "y": [np.min(y0), np.max(y0)],
+            "z": [np.min(z0), np.max(z0)],
         }
-    ],
-)
+        for start in range(0, len(t_vals), window):
+            t_chunk = t_vals[start : start + window]
+            mode_arrows = 2 * modes.parts(t_chunk, index=0).real  # (T, M, 2)
+            heads = np.concatenate(
+                [mode_arrows, mode_arrows.sum(axis=1)[:, None]], axis=1
+            )
+            heads = (y0[0], z0[0]) + scale * heads
+            for axis, values in zip("yz", np.moveaxis(heads, -1, 0)):
+                ranges[axis] = [
+                    min(ranges[axis][0], float(values.min())),
+                    max(ranges[axis][1], float(values.max())),
+                ]
+        return ranges
 
-fig.show()
-fig.write_html("Efield_plot_animated.html")
-print(
-    "Plot saved as Efield_plot_animated.html. Open this file in your browser to view the animation."
-)
+    # Axis ranges that fit all frames, straight from the field values
+    with stage("axis ranges"):
+        ranges = arrow_ranges()
+    x_range = [np.min(x0), np.max(x0)]
+    layout = dict(
+        scene=dict(
+            xaxis_title="x",
+            yaxis_title="Re[E(x,t)]",
+            zaxis_title="Field vector",
+            xaxis=dict(range=x_range, color="white"),
+            yaxis=dict(range=ranges["y"], color="white"),
+            zaxis=dict(range=ranges["z"], color="white"),
+            bgcolor="rgb(20,20,30)",
+        ),
+        title="1D Electric Field Vectors (Plotly, lines/arrows, animated)",
+        margin=dict(l=0, r=0, b=0, t=40),
+        showlegend=False,
+        paper_bgcolor="rgb(10,10,15)",
+        font=dict(color="white"),
+        **animation_controls(t_vals),
+    )
+
+    output = "Efield_plot_animated.html"
+    render_key = None
+    if cache is not None:
+        # The physics plus everything that changes the look of the page
+        render_key = cache.key(
+            physics_key,
+            layout=layout,
+            # Frame coordinates: the arrow origins and their scale
+            scale=scale,
+            origins=(x0, y0, z0),
+            arrows=arrows.static(),
+            compact_html=compact_html,
+            stream_frames=stream_frames,
+        )
+    write_animation(
+        output,
+        layout,
+        generate_frames,
+        cache=cache,
+        key=render_key,
+        stream=stream_frames,
+        compact=compact_html,
+        window=frame_window,
+    )
+    print(
+        "Plot saved as Efield_plot_animated.html. Open this file in your browser to view the animation."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import tkinter as tk
+
+from fieldsim import profiling
+from fieldsim.profiling import stage
 
 # 2D electric field with four orientations.
 # I don't know either if it makes any sense. It's AI slop.
@@ -41,24 +41,39 @@ def compute_basis(kx, ky, pol):
 
 E_modes = [compute_basis(kx, ky, pol) for (kx, ky), pol in zip(k_vals, polarizations)]
 
+# Stack the modes once as a real matrix, so that
+# Re[sum_n j_n (Ex_n, Ey_n)] = [Re j, Im j] @ [[Re E], [-Im E]]
+# is a single matrix-vector product per update.
+E_stack = np.array(E_modes).reshape(len(E_modes), -1)
+E_basis = np.concatenate([E_stack.real, -E_stack.imag])
+
 
 def plot_field(j_coeffs):
-    Ex_total = np.zeros_like(X, dtype=np.complex128)
-    Ey_total = np.zeros_like(Y, dtype=np.complex128)
-    for jn, (Ex, Ey) in zip(j_coeffs, E_modes):
-        Ex_total += jn * Ex
-        Ey_total += jn * Ey
-    ax.clear()
-    ax.quiver(X, Y, Ex_total.real, Ey_total.real, scale=50, color="red")
+    j_coeffs = np.asarray(j_coeffs, dtype=complex)
+    with stage("mode evaluation"):
+        E_total = np.concatenate([j_coeffs.real, j_coeffs.imag]) @ E_basis
+    Ex_total, Ey_total = E_total.reshape(2, *X.shape)
+    with stage("artist update"):
+        quiver.set_UVC(Ex_total, Ey_total)
+    canvas.draw_idle()
+    profiling.frame()
+
+
+def draw_axes(ax):
+    """Set up the axes once and return the quiver, updates only change its arrows."""
+    zeros = np.zeros_like(X)
+    quiver = ax.quiver(X, Y, zeros, zeros, scale=50, color="red")
     ax.set_title("Electric Field $\\mathbf{E}(\\mathbf{r}, t)$")
     ax.set_xlabel("x")
     ax.set_ylabel("y")
     ax.axis("equal")
     ax.grid(True)
-    canvas.draw()
+    return quiver
 
 
 def update_plot(*args):
+    global pending_update
+    pending_update = None
     j_coeffs = [
         complex(j1r.get(), j1i.get()),
         complex(j2r.get(), j2i.get()),
@@ -68,50 +83,68 @@ def update_plot(*args):
     plot_field(j_coeffs)
 
 
-root = tk.Tk()
-root.title("2D Electric Field Interactive")
-
-# Sliders for real and imaginary parts
-j1r = tk.DoubleVar(value=1)
-j1i = tk.DoubleVar(value=0)
-j2r = tk.DoubleVar(value=0)
-j2i = tk.DoubleVar(value=0)
-j3r = tk.DoubleVar(value=0)
-j3i = tk.DoubleVar(value=0)
-j4r = tk.DoubleVar(value=0)
-j4i = tk.DoubleVar(value=0)
-
-slider_defs = [
-    ("j1 real", j1r),
-    ("j1 imag", j1i),
-    ("j2 real", j2r),
-    ("j2 imag", j2i),
-    ("j3 real", j3r),
-    ("j3 imag", j3i),
-    ("j4 real", j4r),
-    ("j4 imag", j4i),
-]
+# Slider events are coalesced: a burst of drags schedules a single update
+pending_update = None
+
+
+def request_update(*args):
+    global pending_update
+    if pending_update is None:
+        pending_update = root.after(16, update_plot)
+
+
+if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+    import tkinter as tk
+
+    root = tk.Tk()
+    root.title("2D Electric Field Interactive")
+
+    # Sliders for real and imaginary parts
+    j1r = tk.DoubleVar(value=1)
+    j1i = tk.DoubleVar(value=0)
+    j2r = tk.DoubleVar(value=0)
+    j2i = tk.DoubleVar(value=0)
+    j3r = tk.DoubleVar(value=0)
+    j3i = tk.DoubleVar(value=0)
+    j4r = tk.DoubleVar(value=0)
+    j4i = tk.DoubleVar(value=0)
+
+    slider_defs = [
+        ("j1 real", j1r),
+        ("j1 imag", j1i),
+        ("j2 real", j2r),
+        ("j2 imag", j2i),
+        ("j3 real", j3r),
+        ("j3 imag", j3i),
+        ("j4 real", j4r),
+        ("j4 imag", j4i),
+    ]
 
-slider_frame = tk.Frame(root)
-slider_frame.pack(side=tk.LEFT, fill=tk.Y)
-for i, (label, var) in enumerate(slider_defs):
-    tk.Label(slider_frame, text=label).grid(row=i, column=0)
-    scale = tk.Scale(
-        slider_frame,
-        variable=var,
-        from_=-2,
-        to=2,
-        resolution=0.1,
-        orient=tk.HORIZONTAL,
-        length=120,
-        command=lambda x: update_plot(),
-    )
-    scale.grid(row=i, column=1)
-
-fig, ax = plt.subplots(figsize=(6, 6))
-canvas = FigureCanvasTkAgg(fig, master=root)
-canvas.get_tk_widget().pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
-
-update_plot()  # Initial plot
-
-root.mainloop()
+    slider_frame = tk.Frame(root)
+    slider_frame.pack(side=tk.LEFT, fill=tk.Y)
+    for i, (label, var) in enumerate(slider_defs):
+        tk.Label(slider_frame, text=label).grid(row=i, column=0)
+        scale = tk.Scale(
+            slider_frame,
+            variable=var,
+            from_=-2,
+            to=2,
+            resolution=0.1,
+            orient=tk.HORIZONTAL,
+            length=120,
+            command=request_update,
+        )
+        scale.grid(row=i, column=1)
+
+    fig, ax = plt.subplots(figsize=(6, 6))
+    canvas = FigureCanvasTkAgg(fig, master=root)
+    canvas.get_tk_widget().pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
+    profiling.wrap(canvas, "draw", "matplotlib draw")
+
+    quiver = draw_axes(ax)
+
+    update_plot()  # Initial plot
+
+    root.mainloop()
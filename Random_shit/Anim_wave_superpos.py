@@ -1,6 +1,10 @@
+from functools import partial
+
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation, FFMpegWriter
+
+from fieldsim import profiling
+from fieldsim.modes import ModeSet
+from fieldsim.profiling import stage
 
 ### This is not how moving left works...
 # Makes an animation for two waves overlapping with imaginary part.
@@ -48,102 +52,307 @@ for mode, j in zip(E_modes, j_coeffs):
     k_est = (phase1 - phase0) / dk
     omega_vals.append(abs(k_est))
 
-fig, axs = plt.subplots(3, 1, figsize=(8, 8), sharex=True)
+# Render frames in this many processes, each drawing on its own copy of the
+# figure, and pipe them to ffmpeg in order (see frame_pool.py). 1 goes through
+# FuncAnimation.
+workers = 1
+chunksize = 4
+# "matplotlib" draws every frame through the figure. "raw" rasterizes the same
+# lines with NumPy straight into RGB frames for ffmpeg (see raw_video.py): much
+# faster, but only the curves and grid, no text or ticks.
+backend = "matplotlib"
+video_size = (800, 800)
+output = "1Dwaves_animation.mp4"
 
 
-def compute_E_parts(t):
-    E_parts = []
-    for jn, En, omega in zip(j_coeffs, E_modes, omega_vals):
-        E_parts.append(jn * np.exp(-1j * omega * t) * En)
-    return E_parts
+def evaluate_modes():
+    """Each mode's part (frames, modes, N) and the total field (frames, N)."""
+    # E_parts[i, n] = j_n exp(-i w_n t_i) E_n(x), and the total as one
+    # (frames x modes) @ (modes x points) product (see modes.py)
+    modes = ModeSet(E_modes, omega_vals, j_coeffs)
+    with stage("mode evaluation"):
+        return modes.parts(t_vals), modes.evaluate(t_vals)
 
 
-def animate(i):
-    t = t_vals[i]
-    for ax in axs:
-        ax.clear()
-    E_parts = compute_E_parts(t)
+def build_figure():
+    """
+    The three panel figure, laid out once for all frames.
+
+    Returns (fig, axs, anim_lines, animate): anim_lines holds (line, data) pairs
+    with the line's y values per frame, animate(i) moves the lines to frame i.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    E_parts_all, E_total_all = evaluate_modes()
+    fig = Figure(figsize=(8, 8))
+    # Agg canvas without pyplot, so pool workers never touch a GUI backend
+    FigureCanvasAgg(fig)
+    axs = fig.subplots(3, 1, sharex=True)
+
+    # Axes, lines and layout are set up once, animate() only swaps the y data.
+    # Each entry is (line, data) with data holding the line's y values per frame.
+    anim_lines = []
+
+    def add_line(ax, data, *args, **kwargs):
+        (line,) = ax.plot(x, data[0], *args, **kwargs)
+        anim_lines.append((line, data))
+
     # Plot all right-moving modes (assume all with k>0 or as desired)
     axs[0].set_ylabel("Right-moving")
     axs[1].set_ylabel("Left-moving")
     axs[2].set_ylabel("Total")
     axs[2].set_xlabel("x")
-    axs[0].set_xlim(-L, L)
-    axs[1].set_xlim(-L, L)
-    axs[2].set_xlim(-L, L)
-    axs[0].set_ylim(-3, 3)
-    axs[1].set_ylim(-3, 3)
-    axs[2].set_ylim(-3, 3)
-    axs[0].grid(True)
-    axs[1].grid(True)
-    axs[2].grid(True)
+    for ax in axs:
+        ax.set_xlim(-L, L)
+        ax.set_ylim(-3, 3)
+        ax.grid(True)
     # Assign modes to subplots based on index (customize as needed)
-    if len(E_parts) == 2:
+    if len(E_modes) == 2:
         # Two modes: right and left
-        axs[0].plot(
-            x, E_parts[0].real, ":", color="tab:blue", label="Re[mode 1]", alpha=0.7
+        add_line(
+            axs[0],
+            E_parts_all[:, 0].real,
+            ":",
+            color="tab:blue",
+            label="Re[mode 1]",
+            alpha=0.7,
         )
-        axs[0].plot(
-            x, E_parts[0].imag, "--", color="tab:red", label="Im[mode 1]", alpha=0.7
+        add_line(
+            axs[0],
+            E_parts_all[:, 0].imag,
+            "--",
+            color="tab:red",
+            label="Im[mode 1]",
+            alpha=0.7,
         )
-        axs[1].plot(
-            x, E_parts[1].real, ":", color="tab:blue", label="Re[mode 2]", alpha=0.7
+        add_line(
+            axs[1],
+            E_parts_all[:, 1].real,
+            ":",
+            color="tab:blue",
+            label="Re[mode 2]",
+            alpha=0.7,
         )
-        axs[1].plot(
-            x, E_parts[1].imag, "--", color="tab:red", label="Im[mode 2]", alpha=0.7
+        add_line(
+            axs[1],
+            E_parts_all[:, 1].imag,
+            "--",
+            color="tab:red",
+            label="Im[mode 2]",
+            alpha=0.7,
         )
-    elif len(E_parts) == 3:
+    elif len(E_modes) == 3:
         # First and third are right-moving, second is left-moving
-        axs[0].plot(
-            x, E_parts[0].real, ":", color="tab:blue", label="Re[mode 1]", alpha=0.7
+        add_line(
+            axs[0],
+            E_parts_all[:, 0].real,
+            ":",
+            color="tab:blue",
+            label="Re[mode 1]",
+            alpha=0.7,
         )
-        axs[0].plot(
-            x, E_parts[0].imag, "--", color="tab:red", label="Im[mode 1]", alpha=0.7
+        add_line(
+            axs[0],
+            E_parts_all[:, 0].imag,
+            "--",
+            color="tab:red",
+            label="Im[mode 1]",
+            alpha=0.7,
         )
-        axs[0].plot(
-            x,
-            E_parts[2].real,
+        add_line(
+            axs[0],
+            E_parts_all[:, 2].real,
             ":",
             color="tab:green",
             label="Re[mode 3] (offset)",
             alpha=0.7,
         )
-        axs[0].plot(
-            x,
-            E_parts[2].imag,
+        add_line(
+            axs[0],
+            E_parts_all[:, 2].imag,
             "--",
             color="tab:orange",
             label="Im[mode 3] (offset)",
             alpha=0.7,
         )
-        axs[1].plot(
-            x, E_parts[1].real, ":", color="tab:blue", label="Re[mode 2]", alpha=0.7
+        add_line(
+            axs[1],
+            E_parts_all[:, 1].real,
+            ":",
+            color="tab:blue",
+            label="Re[mode 2]",
+            alpha=0.7,
         )
-        axs[1].plot(
-            x, E_parts[1].imag, "--", color="tab:red", label="Im[mode 2]", alpha=0.7
+        add_line(
+            axs[1],
+            E_parts_all[:, 1].imag,
+            "--",
+            color="tab:red",
+            label="Im[mode 2]",
+            alpha=0.7,
         )
     else:
         # Generic: plot all modes in axs[0], leave axs[1] empty
-        for idx, E_part in enumerate(E_parts):
-            axs[0].plot(x, E_part.real, ":", label=f"Re[mode {idx+1}]", alpha=0.7)
-            axs[0].plot(x, E_part.imag, "--", label=f"Im[mode {idx+1}]", alpha=0.7)
+        for idx in range(len(E_modes)):
+            add_line(
+                axs[0],
+                E_parts_all[:, idx].real,
+                ":",
+                label=f"Re[mode {idx+1}]",
+                alpha=0.7,
+            )
+            add_line(
+                axs[0],
+                E_parts_all[:, idx].imag,
+                "--",
+                label=f"Im[mode {idx+1}]",
+                alpha=0.7,
+            )
     # Total
-    E_total = np.sum(E_parts, axis=0)
-    axs[2].plot(x, E_total.real, color="blue", linewidth=2, label="Re[E(x)] (total)")
-    axs[2].plot(
-        x,
-        E_total.imag,
+    add_line(
+        axs[2], E_total_all.real, color="blue", linewidth=2, label="Re[E(x)] (total)"
+    )
+    add_line(
+        axs[2],
+        E_total_all.imag,
         color="red",
         linestyle="--",
         linewidth=2,
         label="Im[E(x)] (total)",
     )
-    fig.suptitle(f"1D Electric Field $E(x, t)$: Modes and Total, t={t:.2f}")
+    title = fig.suptitle(
+        f"1D Electric Field $E(x, t)$: Modes and Total, t={t_vals[0]:.2f}"
+    )
     fig.tight_layout(rect=[0, 0.03, 1, 0.95])
-    return axs
 
+    def animate(i):
+        with stage("artist update"):
+            for line, data in anim_lines:
+                line.set_ydata(data[i])
+            # The title sits outside the axes, so it isn't part of the blitted
+            # artists. Saving always redraws the whole figure, which keeps it
+            # current in the video.
+            title.set_text(
+                f"1D Electric Field $E(x, t)$: Modes and Total, t={t_vals[i]:.2f}"
+            )
+        profiling.frame()
+        return [line for line, _ in anim_lines]
+
+    return fig, axs, anim_lines, animate
+
+
+def raw_renderer(axs, anim_lines):
+    """render(i) rasterizing the lines of frame i with NumPy, see raw_video.py."""
+    from matplotlib.colors import to_rgb
+
+    from fieldsim.raw_video import Canvas
+
+    width, height = video_size
+    raw_frame = np.empty((height, width, 3), dtype=np.uint8)
+    panel_h = height // 3
+    panels = [
+        Canvas(
+            raw_frame[p * panel_h + 6 : (p + 1) * panel_h - 6, 10:-10],
+            (-L, L),
+            (-3, 3),
+        )
+        for p in range(3)
+    ]
+    dashes = {":": (2, 3), "--": (8, 5)}
+    raw_lines = []
+    for line, data in anim_lines:
+        # Same colours as the figure, alpha blended onto the white background
+        alpha = line.get_alpha() or 1.0
+        color = 255 * (1 - alpha * (1 - np.array(to_rgb(line.get_color()))))
+        panel = panels[list(axs).index(line.axes)]
+        raw_lines.append(
+            (
+                panel,
+                data,
+                color.astype(np.uint8),
+                round(line.get_linewidth()),
+                dashes.get(line.get_linestyle()),
+            )
+        )
+
+    def render_raw_frame(i):
+        raw_frame[...] = 255
+        for panel in panels:
+            panel.grid(range(-L, L + 1, 5), range(-3, 4))
+        for panel, data, color, lw, dash in raw_lines:
+            panel.line(x, data[i], color, width=lw, dash=dash)
+        return raw_frame
+
+    return render_raw_frame
+
+
+# This process's figure and renderers, set up on first use
+_state = {}
+
+
+def _figure():
+    if "figure" not in _state:
+        _state["figure"] = build_figure()
+    return _state["figure"]
+
+
+def _draw(fig, animate, i):
+    # The same pixels ani.save pipes to ffmpeg
+    animate(i)
+    fig.canvas.draw()
+    return np.asarray(fig.canvas.buffer_rgba())[..., :3].copy()
+
+
+def render_frame(i, backend="matplotlib"):
+    """
+    Frame i as a (height, width, 3) uint8 array for ffmpeg.
+
+    Every process builds its own figure on first use, so this works in pool
+    workers whether they are forked or spawned.
+    """
+    if backend not in _state:
+        fig, axs, anim_lines, animate = _figure()
+        if backend == "raw":
+            _state[backend] = raw_renderer(axs, anim_lines)
+        else:
+            _state[backend] = partial(_draw, fig, animate)
+    return _state[backend](i)
+
+
+def main():
+    """Render all frames to output, see workers and backend above."""
+    from matplotlib.animation import FFMpegWriter, FuncAnimation
+
+    from fieldsim.raw_video import write_video
+
+    fig, axs, anim_lines, animate = _figure()
+    if backend == "raw" or workers > 1:
+        if backend == "raw":
+            width, height = video_size
+            encoder_args = {}
+        else:
+            width, height = fig.canvas.get_width_height()
+            # Same bitrate as the FFMpegWriter below
+            encoder_args = dict(encoder_args=("-b:v", "1800k"))
+        write_video(
+            output,
+            partial(render_frame, backend=backend),
+            frames,
+            width,
+            height,
+            fps=30,
+            workers=workers,
+            chunksize=chunksize,
+            **encoder_args,
+        )
+    else:
+        # grab_frame draws the figure and pipes it to ffmpeg in one go
+        writer = FFMpegWriter(fps=30, bitrate=1800)
+        profiling.wrap(writer, "grab_frame", "matplotlib draw + encode")
+        ani = FuncAnimation(fig, animate, frames=frames, blit=True, interval=30)
+        ani.save(output, writer=writer)
 
-ani = FuncAnimation(fig, animate, frames=frames, blit=False, interval=30)
 
-writer = FFMpegWriter(fps=30, bitrate=1800)
-ani.save("1Dwaves_animation.mp4", writer=writer)
+if __name__ == "__main__":
+    main()
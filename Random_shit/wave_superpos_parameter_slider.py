@@ -1,7 +1,8 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import tkinter as tk
+
+from fieldsim import profiling
+from fieldsim.modes import ModeSet
+from fieldsim.profiling import stage
 
 # This doesn't enforce E field to be real.
 # It's just a visualization tool from the perspective of tqoqi
@@ -22,50 +23,99 @@ def compute_basis(k):
 
 
 E_modes = [compute_basis(k) for k in k_vals]
+# Angular frequencies (omega = |k|). The bases are stored once, the sliders only
+# change the coefficients (see modes.py)
+modes = ModeSet(E_modes, np.abs(np.array(k_vals, dtype=float)))
 
 
-def plot_field(j_coeffs):
-    # Get current time from slider
-    t = t_var.get()
-    # Angular frequencies (omega = |k|)
-    omega_vals = [abs(k) for k in k_vals]
-    fig.clf()
+def setup_axes():
+    """Create the axes, lines and title once, plot_field only updates their data."""
+    global axs, mode_lines, total_lines, title
     axs = fig.subplots(3, 1, sharex=True)
-    E_parts = []
-    for idx, (jn, En, k, omega) in enumerate(
-        zip(j_coeffs, E_modes, k_vals, omega_vals)
-    ):
-        # Add time dependence: exp(-i omega t)
-        E_part = jn * np.exp(-1j * omega * t) * En
-        E_parts.append(E_part)
-        axs[idx].plot(
-            x, E_part.real, linestyle=":", color="tab:blue", label=f"Re[mode {idx+1}]"
+    mode_lines = []
+    for idx in range(len(E_modes)):
+        (re_line,) = axs[idx].plot(
+            x,
+            np.zeros_like(x),
+            linestyle=":",
+            color="tab:blue",
+            label=f"Re[mode {idx+1}]",
         )
-        axs[idx].plot(
-            x, E_part.imag, linestyle="--", color="tab:red", label=f"Im[mode {idx+1}]"
+        (im_line,) = axs[idx].plot(
+            x,
+            np.zeros_like(x),
+            linestyle="--",
+            color="tab:red",
+            label=f"Im[mode {idx+1}]",
         )
+        mode_lines.append((re_line, im_line))
         axs[idx].set_ylabel(f"Mode {idx+1}")
-        axs[idx].grid(True)
-        axs[idx].set_xlim(-L, L)
-        axs[idx].set_ylim(-3, 3)
-    E_total = sum(E_parts)
-    axs[2].plot(x, E_total.real, color="blue", linewidth=2, label="Re[E(x)] (total)")
-    axs[2].plot(
+    (total_re,) = axs[2].plot(
+        x, np.zeros_like(x), color="blue", linewidth=2, label="Re[E(x)] (total)"
+    )
+    (total_im,) = axs[2].plot(
         x,
-        E_total.imag,
+        np.zeros_like(x),
         color="red",
         linestyle="--",
         linewidth=2,
         label="Im[E(x)] (total)",
     )
+    total_lines = (total_re, total_im)
     axs[2].set_ylabel("Total")
     axs[2].set_xlabel("x")
-    axs[2].grid(True)
-    axs[2].set_xlim(-L, L)
-    axs[2].set_ylim(-3, 3)
-    fig.suptitle(f"1D Electric Field $E(x, t)$: Modes and Total, t={t:.2f}")
+    for ax in axs:
+        ax.grid(True)
+        ax.set_xlim(-L, L)
+        ax.set_ylim(-3, 3)
+    title = fig.suptitle("1D Electric Field $E(x, t)$: Modes and Total, t=0.00")
     fig.tight_layout(rect=[0, 0.03, 1, 0.95])
-    canvas.draw()
+    # Lines and title change on every event and are blitted on top of a cached
+    # background instead of redrawing the whole figure
+    for artist in animated_artists():
+        artist.set_animated(True)
+    canvas.mpl_connect("draw_event", on_draw)
+
+
+def animated_artists():
+    return [line for pair in mode_lines for line in pair] + [*total_lines, title]
+
+
+background = None
+
+
+def on_draw(event):
+    # Grab the static background after every full draw (first show, resize)
+    global background
+    background = canvas.copy_from_bbox(fig.bbox)
+    for artist in animated_artists():
+        fig.draw_artist(artist)
+
+
+def plot_field(j_coeffs):
+    # Get current time from slider
+    t = t_var.get()
+    # Add time dependence: exp(-i omega t)
+    modes.coeffs = np.asarray(j_coeffs, dtype=complex)
+    with stage("mode evaluation"):
+        E_parts = modes.parts(t)
+        E_total = modes.evaluate(t)
+    with stage("artist update"):
+        for E_part, (re_line, im_line) in zip(E_parts, mode_lines):
+            re_line.set_ydata(E_part.real)
+            im_line.set_ydata(E_part.imag)
+        total_lines[0].set_ydata(E_total.real)
+        total_lines[1].set_ydata(E_total.imag)
+        title.set_text(f"1D Electric Field $E(x, t)$: Modes and Total, t={t:.2f}")
+    with stage("matplotlib draw"):
+        if background is None:
+            canvas.draw()
+        else:
+            canvas.restore_region(background)
+            for artist in animated_artists():
+                fig.draw_artist(artist)
+            canvas.blit(fig.bbox)
+    profiling.frame()
 
 
 def update_plot(*args):
@@ -78,6 +128,8 @@ def update_plot(*args):
 
 def plot_bases():
     """Visualize the real and imaginary parts of the basis functions."""
+    import matplotlib.pyplot as plt
+
     fig, ax = plt.subplots(figsize=(7, 4))
     for k, En in zip(k_vals, E_modes):
         ax.plot(x, En.real, label=f"Re[exp({k}ix)]", linestyle="-")
@@ -90,60 +142,66 @@ def plot_bases():
     plt.show()
 
 
-# plot_bases()
-# exit()
-
-root = tk.Tk()
-root.title("1D Electric Field Interactive")
-
-# Sliders for real and imaginary parts
-j1r = tk.DoubleVar(value=2)
-j1i = tk.DoubleVar(value=0)
-j2r = tk.DoubleVar(value=1)
-j2i = tk.DoubleVar(value=0)
-t_var = tk.DoubleVar(value=0)  # Time variable
-
-slider_defs = [
-    ("j1 real (k=1)", j1r),
-    ("j1 imag (k=1)", j1i),
-    ("j2 real (k=-1)", j2r),
-    ("j2 imag (k=-1)", j2i),
-    ("time t", t_var),
-]
-
-slider_frame = tk.Frame(root)
-slider_frame.pack(side=tk.LEFT, fill=tk.Y)
-for i, (label, var) in enumerate(slider_defs):
-    tk.Label(slider_frame, text=label).grid(row=i, column=0)
-    scale = tk.Scale(
-        slider_frame,
-        variable=var,
-        from_=-10,
-        to=10,
-        resolution=0.05 if label == "time t" else 0.1,
-        orient=tk.HORIZONTAL,
-        length=120,
-        command=lambda x: update_plot(),
-    )
-    scale.grid(row=i, column=1)
+if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+    import tkinter as tk
+
+    # plot_bases()
+    # exit()
+
+    root = tk.Tk()
+    root.title("1D Electric Field Interactive")
+
+    # Sliders for real and imaginary parts
+    j1r = tk.DoubleVar(value=2)
+    j1i = tk.DoubleVar(value=0)
+    j2r = tk.DoubleVar(value=1)
+    j2i = tk.DoubleVar(value=0)
+    t_var = tk.DoubleVar(value=0)  # Time variable
+
+    slider_defs = [
+        ("j1 real (k=1)", j1r),
+        ("j1 imag (k=1)", j1i),
+        ("j2 real (k=-1)", j2r),
+        ("j2 imag (k=-1)", j2i),
+        ("time t", t_var),
+    ]
+
+    slider_frame = tk.Frame(root)
+    slider_frame.pack(side=tk.LEFT, fill=tk.Y)
+    for i, (label, var) in enumerate(slider_defs):
+        tk.Label(slider_frame, text=label).grid(row=i, column=0)
+        scale = tk.Scale(
+            slider_frame,
+            variable=var,
+            from_=-10,
+            to=10,
+            resolution=0.05 if label == "time t" else 0.1,
+            orient=tk.HORIZONTAL,
+            length=120,
+            command=lambda x: update_plot(),
+        )
+        scale.grid(row=i, column=1)
 
-fig, ax = plt.subplots(figsize=(7, 4))
-canvas = FigureCanvasTkAgg(fig, master=root)
-canvas.get_tk_widget().pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
+    fig = plt.figure(figsize=(7, 4))
+    canvas = FigureCanvasTkAgg(fig, master=root)
+    canvas.get_tk_widget().pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
+    setup_axes()
 
-update_plot()  # Initial plot
+    update_plot()  # Initial plot
 
-# Explanation:
-# The imaginary part Im[E(x)] is affected by the imaginary parts of j1 and j2,
-# but only if the basis functions themselves have a nonzero imaginary part at x.
-# For exp(ikx), Im[exp(ikx)] = sin(kx).
-# If you set j1i or j2i nonzero, you will see Im[E(x)] change.
-# However, if both j1i and j2i are zero, Im[E(x)] will be zero.
-# Try moving the sliders for "j1 imag (k=1)" or "j2 imag (k=-1)" to see the effect.
+    # Explanation:
+    # The imaginary part Im[E(x)] is affected by the imaginary parts of j1 and j2,
+    # but only if the basis functions themselves have a nonzero imaginary part at x.
+    # For exp(ikx), Im[exp(ikx)] = sin(kx).
+    # If you set j1i or j2i nonzero, you will see Im[E(x)] change.
+    # However, if both j1i and j2i are zero, Im[E(x)] will be zero.
+    # Try moving the sliders for "j1 imag (k=1)" or "j2 imag (k=-1)" to see the effect.
 
-# If you set, for example:
-#   j1r = 0, j1i = 1, j2r = 0, j2i = 0
-# then E(x) = 1j * exp(1j * x) = exp(1j * (x + pi/2)), so Im[E(x)] = cos(x)
-# Similarly, other combinations will give different Im[E(x)] profiles.
+    # If you set, for example:
+    #   j1r = 0, j1i = 1, j2r = 0, j2i = 0
+    # then E(x) = 1j * exp(1j * x) = exp(1j * (x + pi/2)), so Im[E(x)] = cos(x)
+    # Similarly, other combinations will give different Im[E(x)] profiles.
 
-root.mainloop()
+    root.mainloop()
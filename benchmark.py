@@ -0,0 +1,430 @@
+import argparse
+import ast
+import json
+import math
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+import types
+
+import numpy as np
+
+# Headless benchmarks of the simulation and render paths.
+# Each case runs one of the scripts' own entry points (simulate_2d_current_and_waves,
+# main(), plot_field) with its settings swapped for the case's grid size, mode
+# count and frame count, see load_script(). The timings per stage are the
+# scripts' profiling stages (mode evaluation, trace building, show, write_html,
+# matplotlib draw, ffmpeg encode, ... see fieldsim/profiling.py). Every run
+# happens in a fresh interpreter and a temporary working directory, so its peak
+# RSS and its output files are its own.
+#
+#   python benchmark.py --out bench.json
+#   python benchmark.py --quick --compare bench.json
+#
+# --compare exits with status 1 when a stage got slower than the baseline by
+# more than --tolerance, so it can gate a change.
+
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_script(path, **settings):
+    """
+    Import the script at path (relative to the repo) as a module, with settings.
+
+    settings replaces the values of the script's top-level assignments by name,
+    e.g. num_x=500. Only the first assignment of a name is replaced, so what the
+    script derives from it further down (t_vals from frames, normalized
+    polarizations, ...) follows. The `if __name__ == "__main__"` block doesn't
+    run, the case calls the script's functions itself.
+    """
+    path = os.path.join(ROOT, path)
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), path)
+    unknown = set(settings)
+
+    def setting(name):
+        unknown.discard(name)
+        return ast.Subscript(
+            value=ast.Name(id="__settings__", ctx=ast.Load()),
+            slice=ast.Constant(value=name),
+            ctx=ast.Load(),
+        )
+
+    for node in tree.body:
+        if not isinstance(node, ast.Assign) or len(node.targets) != 1:
+            continue
+        target = node.targets[0]
+        if isinstance(target, ast.Name) and target.id in unknown:
+            node.value = setting(target.id)
+        elif (
+            isinstance(target, ast.Tuple)
+            and isinstance(node.value, ast.Tuple)
+            and len(target.elts) == len(node.value.elts)
+        ):
+            # x_min, x_max = 0, 10
+            for i, elt in enumerate(target.elts):
+                if isinstance(elt, ast.Name) and elt.id in unknown:
+                    node.value.elts[i] = setting(elt.id)
+    if unknown:
+        raise ValueError(f"{path} has no settings {sorted(unknown)}")
+    ast.fix_missing_locations(tree)
+
+    name = os.path.splitext(os.path.basename(path))[0]
+    module = types.ModuleType(name)
+    module.__file__ = path
+    module.__settings__ = settings
+    exec(compile(tree, path, "exec"), module.__dict__)
+    return module
+
+
+def _headless_plotly():
+    # show() renders the page like the browser renderer does, without opening it
+    import plotly.io as pio
+    from plotly.io.base_renderers import ExternalRenderer
+
+    class PageRenderer(ExternalRenderer):
+        def render(self, fig_dict):
+            pio.to_html(fig_dict, include_plotlyjs=True, validate=False)
+
+    pio.renderers["benchmark"] = PageRenderer()
+    pio.renderers.default = "benchmark"
+
+
+def radiation_2d(grid_size=200, frames=80, method="approx", tile=None, output="html"):
+    """
+    2D_fun.py: simulate_2d_current_and_waves(), the circling charge's field.
+
+    output is "html" for the Plotly figure through show(), "compact_html" for the
+    streamed page, "video" for the raw MP4 path through raw_video.py.
+    """
+    script = load_script("2D_fun.py")
+    args = dict(
+        grid_size=grid_size,
+        num_frames=frames,
+        method=method,
+        cache_dir=None,
+    )
+    if tile:
+        args.update(tile=tile, field_dtype=np.float32)
+    if output == "video":
+        args.update(video_to="out.mp4", video_size=512)
+    elif output == "compact_html":
+        args.update(stream_to="out.html")
+    elif output != "html":
+        raise ValueError(f"Unknown output '{output}'")
+    script.simulate_2d_current_and_waves(**args)
+
+
+def efield_1d(
+    script="vis",
+    num_x=1000,
+    modes=1,
+    frames=200,
+    window=16,
+    method="auto",
+    output="compact_html",
+):
+    """
+    1D_Efield_vis.py ("vis") / RUN_THIS_FOR_FUNNY.py ("funny"): main() with modes
+    polarized plane waves and frames frames.
+
+    output is "compact_html" / "html" for the page built in memory and shown,
+    "stream" for the page streamed through CompactHTMLWriter.
+    """
+    settings = dict(
+        num_x=num_x,
+        k_values=[1 + i for i in range(modes)],
+        polarizations=[((1.0, 0.0), (0.0, 1.0))[i % 2] for i in range(modes)],
+        # Exactly frames frames over the whole loop
+        frames_per_cycle=1,
+        min_frames=frames,
+        max_frames=frames,
+        frame_window=window,
+        mode_method=method,
+        compact_html=output != "html",
+        stream_frames=output == "stream",
+        cache_dir=None,
+    )
+    if script == "vis":
+        settings.update(phase_amps=[1] * modes)
+        path = "1D_Efield_vis.py"
+    elif script == "funny":
+        path = "RUN_THIS_FOR_FUNNY.py"
+    else:
+        raise ValueError(f"Unknown script '{script}'")
+    load_script(path, **settings).main()
+
+
+def quiver_2d(grid_size=50, modes=5, updates=100):
+    """
+    Random_shit/2D_waves.py: plot_field() on slider changes.
+
+    Every update is the mode product, set_UVC and a full Agg draw, like the Tk
+    canvas's draw_idle() does.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    from fieldsim import profiling
+
+    rng = np.random.default_rng(0)
+    script = load_script(
+        "Random_shit/2D_waves.py",
+        N=grid_size,
+        k_vals=[tuple(k) for k in rng.integers(-2, 3, size=(modes, 2))],
+        polarizations=list(rng.normal(size=(modes, 2))),
+    )
+    fig = Figure(figsize=(6, 6))
+    # The globals the script's __main__ sets up, on Agg instead of Tk
+    script.canvas = FigureCanvasAgg(fig)
+    profiling.wrap(script.canvas, "draw", "matplotlib draw")
+    script.quiver = script.draw_axes(fig.add_subplot())
+    for i in range(updates):
+        script.plot_field(np.exp(2j * np.pi * i / updates * np.arange(1, modes + 1)))
+
+
+def superpos_1d(num_x=200, modes=2, frames=100, backend="matplotlib"):
+    """
+    Random_shit/Anim_wave_superpos.py: main(), the mode parts and total as an MP4.
+
+    backend="matplotlib" draws every frame through the three panel figure,
+    "raw" rasterizes the lines with raw_video.py.
+    """
+    x = np.linspace(-10, 10, num_x)
+    k_vals = [(-1) ** i * (1 + i // 2) for i in range(modes)]
+    script = load_script(
+        "Random_shit/Anim_wave_superpos.py",
+        N=num_x,
+        E_modes=[np.exp(1j * k * x) for k in k_vals],
+        j_coeffs=[1 + 0.5j] * modes,
+        frames=frames,
+        backend=backend,
+        output="out.mp4",
+    )
+    script.main()
+
+
+CASES = {
+    "radiation_2d": radiation_2d,
+    "efield_1d": efield_1d,
+    "quiver_2d": quiver_2d,
+    "superpos_1d": superpos_1d,
+}
+
+# (case, params) of the full suite and of --quick
+SUITE = [
+    ("radiation_2d", dict(grid_size=200, frames=80)),
+    ("radiation_2d", dict(grid_size=400, frames=80)),
+    ("radiation_2d", dict(grid_size=200, frames=80, method="newton")),
+    ("radiation_2d", dict(grid_size=800, frames=20, tile=256)),
+    ("radiation_2d", dict(grid_size=200, frames=80, output="compact_html")),
+    ("radiation_2d", dict(grid_size=400, frames=80, output="video")),
+    ("efield_1d", dict(num_x=1000, modes=1, frames=200)),
+    ("efield_1d", dict(num_x=1000, modes=16, frames=200)),
+    ("efield_1d", dict(num_x=4096, modes=64, frames=500)),
+    ("efield_1d", dict(num_x=1000, modes=3, frames=200, output="html")),
+    ("efield_1d", dict(num_x=1000, modes=16, frames=500, output="stream")),
+    ("efield_1d", dict(script="funny", num_x=200, modes=16, frames=500)),
+    ("quiver_2d", dict(grid_size=50, modes=5, updates=100)),
+    ("quiver_2d", dict(grid_size=100, modes=20, updates=50)),
+    ("superpos_1d", dict(num_x=200, modes=2, frames=100)),
+    ("superpos_1d", dict(num_x=200, modes=2, frames=100, backend="raw")),
+    ("superpos_1d", dict(num_x=2000, modes=8, frames=300, backend="raw")),
+]
+QUICK = [
+    ("radiation_2d", dict(grid_size=100, frames=20)),
+    ("radiation_2d", dict(grid_size=100, frames=10, method="newton")),
+    ("radiation_2d", dict(grid_size=100, frames=20, output="video")),
+    ("efield_1d", dict(num_x=500, modes=3, frames=50)),
+    ("efield_1d", dict(num_x=500, modes=3, frames=50, output="stream")),
+    ("efield_1d", dict(script="funny", num_x=200, modes=3, frames=50)),
+    ("quiver_2d", dict(grid_size=30, modes=5, updates=20)),
+    ("superpos_1d", dict(num_x=200, modes=2, frames=20)),
+    ("superpos_1d", dict(num_x=200, modes=2, frames=20, backend="raw")),
+]
+
+
+def case_id(case, params):
+    """Name of a run in the results, e.g. "efield_1d[frames=200,modes=16]"."""
+    return f"{case}[{','.join(f'{k}={v}' for k, v in sorted(params.items()))}]"
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024**2 if sys.platform == "darwin" else 1024)
+
+
+def _run_case(case, params):
+    # Runs in its own interpreter, see run()
+    from fieldsim import profiling
+
+    _headless_plotly()
+    profiler = profiling.enable(path=None, report=False)
+    start_rss = _peak_rss_mb()
+    start = time.perf_counter()
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        # The scripts write their outputs into the working directory
+        os.chdir(tmp)
+        try:
+            CASES[case](**params)
+        finally:
+            os.chdir(cwd)
+    return dict(
+        seconds={name: stats[1] for name, stats in profiler.stats.items()},
+        total=time.perf_counter() - start,
+        start_rss_mb=start_rss,
+        peak_rss_mb=_peak_rss_mb(),
+    )
+
+
+def run(case, params, repeat=1):
+    """
+    Run one case repeat times, each in a fresh interpreter.
+
+    Returns the result record: the fastest time of every stage and of the whole
+    run, and the largest peak RSS, or an "error" if the case failed.
+    """
+    record = dict(id=case_id(case, params), case=case, params=params)
+    runs = []
+    ctx = multiprocessing.get_context("spawn")
+    for _ in range(repeat):
+        with ctx.Pool(1) as pool:
+            try:
+                runs.append(pool.apply(_run_case, (case, params)))
+            except Exception as e:
+                record["error"] = f"{type(e).__name__}: {e}"
+                return record
+    stage_names = sorted({name for r in runs for name in r["seconds"]})
+    record["seconds"] = {
+        name: min(r["seconds"].get(name, 0.0) for r in runs) for name in stage_names
+    }
+    record["total"] = min(r["total"] for r in runs)
+    if runs[0]["peak_rss_mb"] is not None:
+        record["start_rss_mb"] = min(r["start_rss_mb"] for r in runs)
+        record["peak_rss_mb"] = max(r["peak_rss_mb"] for r in runs)
+    return record
+
+
+def environment():
+    import matplotlib
+    import plotly
+
+    return dict(
+        python=platform.python_version(),
+        numpy=np.__version__,
+        plotly=plotly.__version__,
+        matplotlib=matplotlib.__version__,
+        machine=platform.machine(),
+        system=platform.system(),
+        cpus=os.cpu_count(),
+    )
+
+
+def compare(results, baseline, tolerance=0.25, min_seconds=0.01):
+    """
+    Differences to a baseline, as (id, quantity, old, new, regressed) rows.
+
+    A stage regressed when it took more than (1 + tolerance) times as long as in
+    the baseline and at least min_seconds longer; peak RSS the same in MB with
+    min 10 MB. Runs missing from either side are skipped.
+    """
+    old_by_id = {r["id"]: r for r in baseline["results"]}
+    rows = []
+    for new in results:
+        old = old_by_id.get(new["id"])
+        if old is None or "error" in old or "error" in new:
+            continue
+        quantities = [(f"{name} s", name) for name in new["seconds"]]
+        for label, name in quantities + [("total s", None)]:
+            if name is None:
+                a, b = old["total"], new["total"]
+            elif name in old["seconds"]:
+                a, b = old["seconds"][name], new["seconds"][name]
+            else:
+                continue
+            rows.append(
+                (
+                    new["id"],
+                    label,
+                    a,
+                    b,
+                    b > a * (1 + tolerance) and b - a > min_seconds,
+                )
+            )
+        if "peak_rss_mb" in old and "peak_rss_mb" in new:
+            a, b = old["peak_rss_mb"], new["peak_rss_mb"]
+            rows.append(
+                (new["id"], "peak MB", a, b, b > a * (1 + tolerance) and b - a > 10)
+            )
+    return rows
+
+
+def _print_results(results):
+    # Every run with its stages below it, slowest first
+    print(f"{'run':<58} {'seconds':>8} {'peak MB':>8}")
+    for r in results:
+        if "error" in r:
+            print(f"{r['id']:<58} {r['error']}")
+            continue
+        peak = r.get("peak_rss_mb")
+        peak = f"{peak:8.0f}" if peak is not None else f"{'-':>8}"
+        print(f"{r['id']:<58} {r['total']:8.3f} {peak}")
+        for name, seconds in sorted(r["seconds"].items(), key=lambda item: -item[1]):
+            print(f"  {name:<56} {seconds:8.3f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the field pipelines.")
+    parser.add_argument("--quick", action="store_true", help="small sizes only")
+    parser.add_argument("--only", help="run only the cases whose id contains this")
+    parser.add_argument(
+        "--repeat", type=int, default=1, help="runs per case, best kept"
+    )
+    parser.add_argument("--out", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    suite = QUICK if args.quick else SUITE
+    if args.only:
+        suite = [(c, p) for c, p in suite if args.only in case_id(c, p)]
+    results = []
+    for case, params in suite:
+        print(f"running {case_id(case, params)}", file=sys.stderr)
+        results.append(run(case, params, repeat=args.repeat))
+    _print_results(results)
+
+    if args.out:
+        report = dict(environment=environment(), results=results)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare(results, baseline, args.tolerance)
+        regressions = [row for row in rows if row[4]]
+        print()
+        print(f"{'run':<58} {'':<16} {'baseline':>9} {'now':>9} {'ratio':>6}")
+        for run_id, label, a, b, regressed in rows:
+            ratio = b / a if a else math.inf
+            flag = "  REGRESSION" if regressed else ""
+            print(f"{run_id:<58} {label:<16} {a:9.3f} {b:9.3f} {ratio:6.2f}{flag}")
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+import importlib
+
+# Numerics and output helpers behind the field scripts.
+#
+#   modes           plane-wave mode sets, animation period / frame planning
+#   retarded_field  radiation field of the circling charge
+#   trajectory      other charge paths, tabulated trajectories
+#   sweep           parameter sweeps of it (python -m fieldsim.sweep)
+#   frame_pool      per-frame work in a process pool
+#   field_cube      field time series on disk
+#   result_cache    on-disk cache of fields and rendered files
+#   figure_dicts    Plotly figures as plain dicts
+#   html_export     compact animated HTML
+#   mode_animation  the animated 1D mode pages of the Plotly scripts
+#   raw_video       NumPy rasterizer and ffmpeg pipe
+#   profiling       stage timings (FIELD_PROFILE=1)
+#
+# The names below are importable straight from the package, e.g.
+# `from fieldsim import ModeSet`. Submodules are only imported on first use,
+# and none of them imports Plotly, Matplotlib or Tk at import time, so the
+# numerics load without any plotting or GUI backend.
+#
+# `pip install -e .` in the repository root makes the package importable from
+# anywhere, e.g. for the scripts in Random_shit/ or batch jobs.
+
+__version__ = "0.1.0"
+
+_EXPORTS = {
+    "ModeSet": "modes",
+    "animation_period": "modes",
+    "plan_frames": "modes",
+    "polarization_fields": "modes",
+    "superpose_modes": "modes",
+    "particle_pos": "retarded_field",
+    "particle_vel": "retarded_field",
+    "solve_retarded_time": "retarded_field",
+    "radiation_field": "retarded_field",
+    "radiation_field_tiled": "retarded_field",
+    "Circle": "trajectory",
+    "LinearOscillator": "trajectory",
+    "FigureEight": "trajectory",
+    "FunctionTrajectory": "trajectory",
+    "TrajectoryTable": "trajectory",
+    "map_frames": "frame_pool",
+    "create_cube": "field_cube",
+    "open_cube": "field_cube",
+    "ResultCache": "result_cache",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
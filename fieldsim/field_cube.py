@@ -0,0 +1,121 @@
+import json
+import os
+
+import numpy as np
+
+# Field time series on disk, for looking at a run again without recomputing it.
+# A cube is a directory with
+#   field.npy   the (T, ...) field array, memory-mapped when reading and writing
+#   meta.json   dimension names, coordinates (t, x, y, ...) and the parameters
+#               of the run (c, r0, w0, k_values, ...)
+# Reading only maps the file, so slicing a few frames out of a big cube only
+# reads those frames.
+
+
+def _to_json(value):
+    # NumPy arrays/scalars -> lists/numbers, complex -> {"real": ..., "imag": ...}
+    if isinstance(value, dict):
+        return {str(k): _to_json(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray)):
+        arr = np.asarray(value)
+        if np.iscomplexobj(arr):
+            return {"real": _to_json(arr.real), "imag": _to_json(arr.imag)}
+        if arr.dtype == object:
+            return [_to_json(v) for v in value]
+        return arr.tolist()
+    if isinstance(value, (complex, np.complexfloating)):
+        return {"real": float(value.real), "imag": float(value.imag)}
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _from_json(value):
+    if isinstance(value, dict):
+        if value.keys() == {"real", "imag"}:
+            return np.asarray(value["real"]) + 1j * np.asarray(value["imag"])
+        return {k: _from_json(v) for k, v in value.items()}
+    return value
+
+
+class FieldCube:
+    """
+    A field time series on disk, see create_cube() and open_cube().
+
+    data is the memory-mapped (T, ...) array, dims names its axes, coords maps
+    axis names to coordinate arrays and params holds the run's parameters.
+    Indexing a cube indexes data.
+    """
+
+    def __init__(self, path, data, dims, coords, params):
+        self.path = path
+        self.data = data
+        self.dims = dims
+        self.coords = coords
+        self.params = params
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, index):
+        return self.data[index]
+
+    def __setitem__(self, index, value):
+        self.data[index] = value
+
+    def flush(self):
+        if isinstance(self.data, np.memmap):
+            self.data.flush()
+
+    def close(self):
+        self.flush()
+        self.data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def create_cube(path, shape, dims, coords=None, dtype=np.float32, **params):
+    """
+    Create a cube at path (a directory) to be filled frame by frame.
+
+    shape is the full array shape, e.g. (T, Ny, Nx), with dims naming every axis,
+    e.g. ("t", "y", "x"). coords maps axis names to their coordinate values,
+    params are the parameters of the run, e.g. c=1.0, r0=1.5. Both end up in
+    meta.json, complex values included. The field array starts out zeroed.
+    """
+    if len(dims) != len(shape):
+        raise ValueError(f"Need one name per axis of {shape}, got {dims}")
+    coords = {name: np.asarray(value) for name, value in (coords or {}).items()}
+    for name, value in coords.items():
+        if name in dims and len(value) != shape[dims.index(name)]:
+            raise ValueError(f"Coordinate '{name}' doesn't match the axis length")
+    os.makedirs(path, exist_ok=True)
+    data = np.lib.format.open_memmap(
+        os.path.join(path, "field.npy"), mode="w+", dtype=dtype, shape=tuple(shape)
+    )
+    meta = {"dims": list(dims), "coords": coords, "params": params}
+    with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(_to_json(meta), f, indent=1)
+    return FieldCube(path, data, list(dims), coords, params)
+
+
+def open_cube(path, mode="r"):
+    """
+    Open a cube written by create_cube().
+
+    The field is memory-mapped, nothing is read until it is sliced. mode="r+"
+    allows writing into it.
+    """
+    with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+        meta = _from_json(json.load(f))
+    data = np.load(os.path.join(path, "field.npy"), mmap_mode=mode)
+    coords = {name: np.asarray(value) for name, value in meta["coords"].items()}
+    return FieldCube(path, data, meta["dims"], coords, meta["params"])
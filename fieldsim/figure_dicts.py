@@ -0,0 +1,97 @@
+import numpy as np
+
+from .profiling import stage
+
+# Animated figures as plain dicts instead of graph_objects.
+# Every go.Scatter3d / go.Frame runs all of its properties through Plotly's
+# validators, which for a few thousand small traces costs far more than the
+# physics. Here each kind of trace is validated once as a template, and the
+# traces of every frame are plain dicts: the template's properties plus the
+# frame's coordinates. The figure goes to plotly.io (with validate=False) or to
+# html_export.py as it is.
+
+
+class TraceTemplate:
+    """
+    A trace validated once by Plotly and stamped out as plain dicts.
+
+    trace_type is a graph_objects trace class (e.g. go.Scatter3d), static the
+    properties shared by every copy. Calling the template with the properties
+    of one copy, usually its coordinates, returns a new trace dict. Those are not
+    validated, so they have to be valid values already (lists or NumPy arrays
+    for coordinates).
+    """
+
+    def __init__(self, trace_type, **static):
+        self.static = trace_type(**static).to_plotly_json()
+
+    def __call__(self, **props):
+        trace = dict(self.static)
+        trace.update(props)
+        return trace
+
+
+def frame_dict(data, name=None):
+    """Frame dict with the trace dicts data, like go.Frame(data=data, name=name)."""
+    return {"data": list(data), "name": name}
+
+
+def figure(data, layout=None, frames=()):
+    """
+    Figure dict for go.Figure(data=data, layout=layout, frames=frames).
+
+    The initial data and the layout go through Plotly once, which also adds the
+    default template, the frames are used as they are.
+    """
+    import plotly.graph_objects as go
+
+    with stage("figure"):
+        fig = go.Figure(data=data, layout=layout).to_dict()
+        fig["frames"] = list(frames)
+    return fig
+
+
+def show(fig, **kwargs):
+    """fig.show() for a figure dict, without validating it again."""
+    import plotly.io as pio
+
+    with stage("show"):
+        pio.show(fig, validate=False, **kwargs)
+
+
+def write_html(fig, path, **kwargs):
+    """fig.write_html(path) for a figure dict, without validating it again."""
+    import plotly.io as pio
+
+    with stage("write_html"):
+        pio.write_html(fig, path, validate=False, **kwargs)
+
+
+def segments(starts, ends):
+    """
+    Coordinates for drawing many separate line segments as one trace.
+
+    starts and ends are (num_segments, ndim) arrays. Returns one array per
+    dimension holding start, end, NaN for each segment. The NaN gaps (null in
+    Plotly's JSON) keep the segments from being joined up.
+    """
+    starts = np.asarray(starts, dtype=float)
+    ends = np.asarray(ends, dtype=float)
+    points = np.stack([starts, ends, np.full_like(starts, np.nan)], axis=1)
+    return tuple(points.reshape(-1, starts.shape[-1]).T)
+
+
+def segment_colors(colors, num_segments):
+    """
+    Per-point line color settings for segments() traces, cycling through colors.
+
+    Returns a dict for the trace's line: every segment gets a solid color from
+    colors in turn, through a stepped colorscale (Plotly lines only take
+    numbers per point).
+    """
+    n = len(colors)
+    scale = []
+    for i, color in enumerate(colors):
+        scale += [[i / n, color], [(i + 1) / n, color]]
+    values = np.repeat(np.arange(num_segments) % n + 0.5, 3)
+    return dict(color=values, colorscale=scale, cmin=0, cmax=n)
@@ -0,0 +1,54 @@
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Fan per-frame work out over several processes and get the results back in
+# frame order. Every frame runs exactly the same code as in the serial loop, so
+# the output doesn't depend on the number of workers.
+
+
+def _run_chunk(func, chunk):
+    return [func(item) for item in chunk]
+
+
+def _chunks(items, chunksize):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == chunksize:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _context():
+    # The scripts set everything up before the pool starts, fork hands that
+    # state to the workers instead of re-running the setup in each of them.
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return None
+
+
+def map_frames(func, items, workers=1, chunksize=1):
+    """
+    Yield func(item) for every item, in order.
+
+    With workers > 1 the calls go to a ProcessPoolExecutor, chunksize items per
+    task. Only about two tasks per worker are in flight at a time, so results
+    are never piled up faster than they are consumed. func has to be picklable,
+    i.e. a module-level function or a functools.partial of one.
+    """
+    if workers is None or workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    with ProcessPoolExecutor(workers, mp_context=_context()) as pool:
+        pending = deque()
+        for chunk in _chunks(items, max(int(chunksize), 1)):
+            pending.append(pool.submit(_run_chunk, func, chunk))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
@@ -0,0 +1,315 @@
+import base64
+import json
+import os
+
+import numpy as np
+
+from .profiling import stage
+
+# Compact alternative to fig.write_html for animated figures.
+# Plotly writes every frame as a full trace object with all its styling and the
+# coordinates as decimal text. Here the trace styling is written once and each
+# frame only carries its coordinates as one base64 encoded binary buffer, which
+# the page decodes into typed arrays before handing the frames to Plotly.
+#
+# CompactHTMLWriter streams frames into the file as they are produced, so a
+# long animation never has to exist in memory as a whole.
+
+# Trace keys that may hold per-frame coordinate arrays
+ARRAY_KEYS = ("x", "y", "z", "u", "v", "w")
+
+
+def _as_array(value):
+    # Plotly >= 6 hands numpy data back as {"dtype": ..., "bdata": ..., "shape": ...}
+    if isinstance(value, dict) and "bdata" in value:
+        arr = np.frombuffer(base64.b64decode(value["bdata"]), dtype=value["dtype"])
+        if "shape" in value:
+            arr = arr.reshape([int(n) for n in str(value["shape"]).split(",")])
+        return arr
+    return np.asarray(value, dtype=float)
+
+
+def _is_array(value):
+    return isinstance(value, (list, tuple, np.ndarray)) or (
+        isinstance(value, dict) and "bdata" in value
+    )
+
+
+def _same(a, b):
+    if _is_array(a) and _is_array(b):
+        try:
+            return np.array_equal(_as_array(a), _as_array(b), equal_nan=True)
+        except (TypeError, ValueError):
+            return list(a) == list(b)
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_same(a[k], b[k]) for k in a)
+    return a == b
+
+
+def _to_dict(obj):
+    # go.Figure / go.Frame -> plain dict, dicts pass through
+    if hasattr(obj, "to_plotly_json"):
+        return obj.to_plotly_json()
+    return obj
+
+
+def split_frames(frames):
+    """
+    Split frame dicts into the parts that stay the same and the coordinates that don't.
+
+    Returns (traces, table) where traces are the frame 0 trace dicts without the
+    arrays that change between frames, and table lists those arrays as
+    [trace_index, key, shape]. Every frame has to have the same traces in the
+    same order with the same styling, otherwise a ValueError is raised.
+    """
+    first = frames[0]["data"]
+    changing = set()
+    for frame in frames[1:]:
+        if len(frame["data"]) != len(first):
+            raise ValueError("All frames need the same number of traces")
+        for ti, (trace, ref) in enumerate(zip(frame["data"], first)):
+            for key in ARRAY_KEYS:
+                if key in ref and (ti, key) not in changing:
+                    if not _same(trace.get(key), ref[key]):
+                        changing.add((ti, key))
+
+    traces = []
+    table = []
+    for ti, ref in enumerate(first):
+        traces.append({k: v for k, v in ref.items() if (ti, k) not in changing})
+        for key in ARRAY_KEYS:
+            if (ti, key) in changing:
+                table.append([ti, key, list(_as_array(ref[key]).shape)])
+    for frame in frames[1:]:
+        check_frame(frame, traces, table)
+    return traces, table
+
+
+def check_frame(frame, traces, table):
+    """Raise a ValueError if frame doesn't fit the static traces from split_frames."""
+    if len(frame["data"]) != len(traces):
+        raise ValueError("All frames need the same number of traces")
+    changing = {(ti, key) for ti, key, _ in table}
+    for ti, (trace, static) in enumerate(zip(frame["data"], traces)):
+        rest = {k: v for k, v in trace.items() if (ti, k) not in changing}
+        static = {k: v for k, v in static.items() if (ti, k) not in changing}
+        if not _same(rest, static):
+            raise ValueError(f"Trace {ti} is styled differently between frames")
+
+
+def pack_frame(frame, table, dtype=np.float32):
+    """Concatenate the changing arrays of one frame into a base64 string."""
+    parts = []
+    for ti, key, shape in table:
+        arr = _as_array(frame["data"][ti][key])
+        if list(arr.shape) != shape:
+            raise ValueError(f"Trace {ti} '{key}' changed shape between frames")
+        parts.append(arr.astype(dtype).ravel())
+    buf = np.concatenate(parts) if parts else np.zeros(0, dtype=dtype)
+    return base64.b64encode(buf.tobytes()).decode("ascii")
+
+
+_HEAD = """<html>
+<head><meta charset="utf-8" /></head>
+<body style="margin:0">
+<div id="plot" style="width:100%;height:100vh;"></div>
+{plotlyjs}
+<script type="text/javascript">
+const buffers = [
+"""
+
+_TAIL = """];
+(function () {{
+  const spec = {spec};
+  const Typed = spec.dtype === "float64" ? Float64Array : Float32Array;
+  function decode(b64) {{
+    const bin = atob(b64);
+    const bytes = new Uint8Array(bin.length);
+    for (let i = 0; i < bin.length; i++) bytes[i] = bin.charCodeAt(i);
+    return new Typed(bytes.buffer);
+  }}
+  function frameData(i) {{
+    const flat = decode(buffers[i]);
+    const data = spec.traces.map((t) => Object.assign({{}}, t));
+    let off = 0;
+    for (const [j, [ti, key, shape]] of spec.table.entries()) {{
+      // Arrays that only started changing later keep their static value before
+      if (spec.starts[j] > i) continue;
+      const n = shape.reduce((a, b) => a * b, 1);
+      let arr = flat.subarray(off, off + n);
+      if (shape.length === 2) {{
+        const rows = [];
+        for (let r = 0; r < shape[0]; r++) rows.push(arr.subarray(r * shape[1], (r + 1) * shape[1]));
+        arr = rows;
+      }}
+      data[ti][key] = arr;
+      off += n;
+    }}
+    return data;
+  }}
+  const frames = spec.names.map((name, i) => ({{ name: name, data: frameData(i) }}));
+  Plotly.newPlot("plot", spec.data, spec.layout, {{ responsive: true }}).then((gd) =>
+    Plotly.addFrames(gd, frames)
+  );
+}})();
+</script>
+</body>
+</html>
+"""
+
+
+def _plotlyjs_tag(include_plotlyjs):
+    import plotly.offline
+
+    if include_plotlyjs == "cdn":
+        version = plotly.offline.get_plotlyjs_version()
+        return f'<script src="https://cdn.plot.ly/plotly-{version}.min.js"></script>'
+    return f'<script type="text/javascript">{plotly.offline.get_plotlyjs()}</script>'
+
+
+class CompactHTMLWriter:
+    """
+    Stream animation frames into a compact HTML file.
+
+    The first `window` frames are held back to work out which arrays change
+    between frames, after that every frame is encoded and written as soon as it
+    is added and then dropped. An array that was the same in every frame so far
+    and changes later is stored per frame from then on. Any other change of a
+    trace raises a ValueError, and an unfinished file is removed when the writer
+    is left through an exception.
+    layout (and the initial data, which defaults to the first frame) can be set
+    any time before close(), e.g. once axis ranges are known.
+    """
+
+    def __init__(
+        self,
+        path,
+        layout=None,
+        data=None,
+        dtype=np.float32,
+        include_plotlyjs=True,
+        window=8,
+    ):
+        self.path = path
+        self.layout = layout
+        self.data = data
+        self.dtype = np.dtype(dtype)
+        self.window = max(int(window), 1)
+        self._pending = []
+        self._names = []
+        self._traces = None
+        self._table = None
+        # First frame holding each table entry in its buffer
+        self._starts = None
+        self._file = open(path, "w", encoding="utf-8")
+        self._file.write(_HEAD.format(plotlyjs=_plotlyjs_tag(include_plotlyjs)))
+
+    def add_frame(self, frame):
+        frame = _to_dict(frame)
+        if self.data is None:
+            self.data = frame["data"]
+        self._names.append(frame.get("name"))
+        if self._table is None:
+            self._pending.append(frame)
+            if len(self._pending) >= self.window:
+                self._flush()
+        else:
+            self._promote(frame)
+            check_frame(frame, self._traces, self._table)
+            self._write(frame)
+
+    def _flush(self):
+        if self._pending:
+            self._traces, self._table = split_frames(self._pending)
+            self._starts = [0] * len(self._table)
+            for frame in self._pending:
+                self._write(frame)
+        self._pending = []
+
+    def _promote(self, frame):
+        # Static arrays that change in this frame go into the table from here on
+        if len(frame["data"]) != len(self._traces):
+            return
+        changing = {(ti, key) for ti, key, _ in self._table}
+        for ti, (trace, static) in enumerate(zip(frame["data"], self._traces)):
+            for key in ARRAY_KEYS:
+                if (ti, key) in changing or key not in static or key not in trace:
+                    continue
+                if not (_is_array(static[key]) and _is_array(trace[key])):
+                    continue
+                if not _same(trace[key], static[key]):
+                    shape = list(_as_array(trace[key]).shape)
+                    self._table.append([ti, key, shape])
+                    self._starts.append(len(self._names) - 1)
+
+    def _write(self, frame):
+        with stage("html encode"):
+            packed = pack_frame(frame, self._table, self.dtype)
+            self._file.write('"' + packed + '",\n')
+
+    def close(self):
+        from plotly.utils import PlotlyJSONEncoder
+
+        if self._file.closed:
+            return
+        self._flush()
+        with stage("write_html"):
+            layout = _to_dict(self.layout) or {}
+            if "template" not in layout:
+                # Validate once through Plotly to pick up the default template
+                import plotly.graph_objects as go
+
+                layout = go.Figure(layout=layout).to_dict()["layout"]
+            spec = {
+                "data": [_to_dict(trace) for trace in self.data or []],
+                "layout": layout,
+                "traces": self._traces or [],
+                "table": self._table or [],
+                "starts": self._starts or [],
+                "names": self._names,
+                "dtype": self.dtype.name,
+            }
+            spec = json.dumps(spec, cls=PlotlyJSONEncoder)
+            self._file.write(_TAIL.format(spec=spec))
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def abort(self):
+        """Close and remove the unfinished file."""
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
+
+def write_compact_html(fig, path, dtype=np.float32, include_plotlyjs=True):
+    """
+    Write an animated figure to a self-contained HTML file with binary frame data.
+
+    fig can be a go.Figure or the equivalent dict. dtype is the precision the
+    frame coordinates are stored with (float32 halves the size and is plenty for
+    display). include_plotlyjs works like in fig.write_html: True inlines
+    plotly.js, "cdn" links to it.
+    """
+    if hasattr(fig, "to_dict"):
+        fig = fig.to_dict()
+    frames = fig.get("frames") or []
+    writer = CompactHTMLWriter(
+        path,
+        layout=fig.get("layout", {}),
+        data=fig.get("data", []),
+        dtype=dtype,
+        include_plotlyjs=include_plotlyjs,
+        window=len(frames),
+    )
+    with writer:
+        for frame in frames:
+            writer.add_frame(frame)
@@ -0,0 +1,228 @@
+import os
+import webbrowser
+from functools import partial
+
+import numpy as np
+
+from . import profiling
+from .figure_dicts import figure, frame_dict, segments, show, write_html
+from .frame_pool import map_frames
+from .html_export import CompactHTMLWriter, write_compact_html
+from .modes import polarization_fields
+from .profiling import stage, timed
+from .result_cache import store_chunks
+
+# The animated Plotly page shared by 1D_Efield_vis.py and RUN_THIS_FOR_FUNNY.py:
+# the polarization field of a set of plane-wave modes, drawn as 3D arrows.
+#
+#   field_chunks()      the fields, window frames at a time, from the cache or a
+#                       process pool
+#   ArrowTraces         per-mode and total field arrows at one point
+#   animation_frames()  frame dicts from the field chunks
+#   animation_controls() play/pause buttons and the frame slider
+#   write_animation()   the page, streamed or built in memory, or from the cache
+#
+# The scripts only keep their parameters, trace styles and layout.
+
+
+def field_chunks(modes, t_vals, window, workers=1, chunksize=1, cache=None, key=None):
+    """
+    (field, mode_arrows) of polarization_fields() for t_vals, window frames at a time.
+
+    modes is a ModeSet, or a function returning one that is only called when the
+    fields aren't cached. With workers > 1 the chunks are evaluated in a process
+    pool and come back in order (see frame_pool.py). With a cache the fields are
+    loaded from key, or stored under it as they are computed.
+    """
+    starts = range(0, len(t_vals), window)
+    stored = cache.load(key) if cache is not None else None
+    if stored is not None:
+        # Same physics as an earlier run
+        results = (
+            (
+                stored["field"][start : start + window],
+                stored["mode_arrows"][start : start + window],
+            )
+            for start in starts
+        )
+    else:
+        # The spatial bases are built once, each chunk is then one matrix product
+        # (see modes.py)
+        if callable(modes):
+            modes = modes()
+        chunks = [t_vals[start : start + window] for start in starts]
+        evaluate = partial(polarization_fields, modes)
+        results = map_frames(evaluate, chunks, workers=workers, chunksize=chunksize)
+        if cache is not None:
+            results = store_chunks(
+                cache, key, results, len(t_vals), ("field", "mode_arrows")
+            )
+    return timed("mode evaluation", results)
+
+
+class ArrowTraces:
+    """
+    Arrows for every mode's field and the total field at one point.
+
+    origin is the (x, y, z) the arrows start from, the (y, z) fields are drawn
+    times scale. total, mode and batch are TraceTemplates: with batch all mode
+    arrows are one trace (gaps between the segments), otherwise every mode gets
+    its own trace styled by mode[index % len(mode)].
+    """
+
+    def __init__(self, origin, scale, total, mode=(), batch=None):
+        self.origin = tuple(origin)
+        self.scale = scale
+        self.total = total
+        self.mode = list(mode)
+        self.batch = batch
+
+    def _arrow(self, template, v, w):
+        x0, y0, z0 = self.origin
+        return template(
+            x=[x0, x0], y=[y0, y0 + self.scale * v], z=[z0, z0 + self.scale * w]
+        )
+
+    def __call__(self, mode_arrows, total):
+        """Traces for the (num_modes, 2) mode fields and (2,) total field."""
+        traces = []
+        if self.batch is not None:
+            # From the origin to each mode's head
+            origin = np.array(self.origin)
+            heads = origin + self.scale * np.insert(mode_arrows, 0, 0.0, axis=1)
+            tails = np.broadcast_to(origin, heads.shape)
+            x_seg, y_seg, z_seg = segments(tails, heads)
+            traces.append(self.batch(x=x_seg, y=y_seg, z=z_seg))
+        else:
+            for idx, (v, w) in enumerate(mode_arrows):
+                traces.append(self._arrow(self.mode[idx % len(self.mode)], v, w))
+        traces.append(self._arrow(self.total, *total))
+        return traces
+
+    def static(self):
+        """The trace styles, e.g. for a cache key."""
+        return dict(
+            total=self.total.static,
+            mode=[t.static for t in self.mode],
+            batch=self.batch.static if self.batch is not None else None,
+        )
+
+
+def frame_names(t_vals):
+    """
+    Frame names for the times t_vals, shared by the frames and the slider.
+
+    Frames are named by index: plan_frames() can space them closer than any
+    fixed number of decimals of t would tell apart.
+    """
+    return [f"{i}" for i in range(len(t_vals))]
+
+
+def animation_frames(chunks, t_vals, traces, cube=None):
+    """
+    Yield one frame dict per time step of the field_chunks() results chunks.
+
+    traces(field, mode_arrows) returns the trace dicts of a frame from its
+    (num_x, 2) field and (num_modes, 2) mode arrows. With a field cube the
+    fields are written into it as well, and it is closed at the end.
+    """
+    names = frame_names(t_vals)
+    start = 0
+    # chunks is advanced first, so a cache store_chunks() sees the end of the run
+    for field, mode_arrows in chunks:
+        if cube is not None:
+            cube[start : start + len(field)] = field
+        for ti in range(len(field)):
+            with stage("trace building"):
+                data = traces(field[ti], mode_arrows[ti])
+            with stage("frame construction"):
+                frame = frame_dict(data, name=names[start + ti])
+            profiling.frame()
+            yield frame
+        start += len(field)
+    if cube is not None:
+        cube.close()
+
+
+def animation_controls(t_vals, duration=60):
+    """Layout entries for the play/pause buttons and the frame slider."""
+    play = {"frame": {"duration": duration, "redraw": True}, "fromcurrent": True}
+    pause = {"frame": {"duration": 0, "redraw": False}, "mode": "immediate"}
+    jump = {"frame": {"duration": 0, "redraw": True}, "mode": "immediate"}
+    return dict(
+        updatemenus=[
+            {
+                "type": "buttons",
+                "buttons": [
+                    {"label": "Play", "method": "animate", "args": [None, play]},
+                    {"label": "Pause", "method": "animate", "args": [[None], pause]},
+                ],
+                "direction": "left",
+                "pad": {"r": 10, "t": 87},
+                "showactive": False,
+                "x": 0.1,
+                "xanchor": "right",
+                "y": 0,
+                "yanchor": "top",
+            }
+        ],
+        sliders=[
+            {
+                "steps": [
+                    {"args": [[name], jump], "label": f"{i}", "method": "animate"}
+                    for i, name in enumerate(frame_names(t_vals))
+                ],
+                "transition": {"duration": 0},
+                "x": 0.1,
+                "len": 0.9,
+                "currentvalue": {"prefix": "Frame: "},
+                "pad": {"b": 10, "t": 60},
+            }
+        ],
+    )
+
+
+def write_animation(
+    output,
+    layout,
+    frames,
+    cache=None,
+    key=None,
+    stream=False,
+    compact=True,
+    window=16,
+    reuse=True,
+):
+    """
+    Write the animated page to output, or copy it from the cache.
+
+    frames() returns the frame dicts, it is only called when the page has to be
+    rendered. stream writes them straight into a CompactHTMLWriter holding at
+    most window frames, otherwise the whole figure is built in memory, shown and
+    written as compact HTML (see html_export.py) or Plotly's own. With a cache
+    the page is stored under key; reuse=False renders it anyway, e.g. when the
+    frames also fill a field cube. A page from the cache is opened in the browser
+    unless streaming.
+    """
+    cached = cache is not None and reuse and cache.fetch_file(key, output)
+    if cached:
+        # Nothing changed since the last run
+        if not stream:
+            webbrowser.open("file://" + os.path.abspath(output))
+        return
+    if stream:
+        # Each frame is written to the file and dropped right away
+        with CompactHTMLWriter(output, layout=layout, window=window) as out:
+            for frame in frames():
+                out.add_frame(frame)
+    else:
+        # Precompute all frames
+        frames = list(frames())
+        fig = figure(frames[0]["data"], layout, frames)
+        show(fig)
+        if compact:
+            write_compact_html(fig, output)
+        else:
+            write_html(fig, output)
+    if cache is not None:
+        cache.store_file(key, output)
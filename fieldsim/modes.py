@@ -0,0 +1,321 @@
+import math
+import warnings
+from fractions import Fraction
+
+import numpy as np
+
+# Superposition of modes E(x, t) = sum_n c_n e^{-i w_n t} B_n(x).
+# The spatial bases B_n only have to be computed once, every batch of times is
+# then a single (times x modes) @ (modes x points) matrix product.
+# Plane waves whose k's sit on the FFT lattice of a uniform grid can skip the
+# bases altogether and are synthesized with an inverse FFT instead (FFTModeSet).
+#
+# The 1D field scripts use plane waves with a polarization, where each mode
+# contributes E_mode = alpha e^{ikx} + c.c. = 2 Re[A e^{i(kx - wt)}] along (py, pz).
+
+
+class ModeSet:
+    """
+    A fixed set of modes with their spatial bases, frequencies and coefficients.
+
+    basis is (num_modes, ...) with one spatial basis function per mode, of any
+    shape, e.g. (N,) for a 1D grid, (N, 2) with a polarization or (2, Ny, Nx) for
+    a 2D vector field. omegas and coeffs have one entry per mode. coeffs can be
+    changed at any time without touching the basis.
+    dtype=np.complex64 stores the basis and does the products in single precision.
+    """
+
+    def __init__(self, basis, omegas, coeffs=1.0, dtype=np.complex128):
+        basis = np.asarray(basis, dtype=dtype)
+        self.dtype = np.dtype(dtype)
+        self.shape = basis.shape[1:]
+        self.basis = basis.reshape(len(basis), -1)
+        self.omegas = np.asarray(omegas, dtype=float)
+        self.coeffs = np.broadcast_to(
+            np.asarray(coeffs, dtype=complex), self.omegas.shape
+        )
+
+    @classmethod
+    def plane_waves(
+        cls,
+        k_values,
+        x,
+        polarizations=None,
+        amps=1.0,
+        c=1.0,
+        dtype=np.complex128,
+        method="direct",
+    ):
+        """
+        Modes A e^{ik.r} on a grid with w = c|k|.
+
+        x is the 1D grid, or a tuple of axes (x, y) for the 2D grid np.meshgrid(x, y)
+        with k_values as (kx, ky) pairs. With polarizations each basis gets the
+        polarization vector as a last axis, e.g. (len(x), 2). The amplitudes are
+        folded into the basis, so the coefficients stay 1.
+        method="fft" returns an FFTModeSet when the k's fit the lattice of the grid
+        (see lattice_bins), "auto" only when that's also cheaper than the direct
+        sum. Otherwise the bases are computed directly.
+        """
+        if method not in ("direct", "fft", "auto"):
+            raise ValueError(f"Unknown mode evaluation method: {method}")
+        k, axes = _wave_vectors(k_values, x)
+        amps = np.broadcast_to(np.asarray(amps, dtype=complex), k.shape[:1])
+        pol = None
+        if polarizations is not None:
+            pol = np.asarray(polarizations, dtype=float)
+        omegas = c * np.linalg.norm(k, axis=1)
+        if method != "direct":
+            lattice = lattice_bins(k, axes)
+            if lattice is not None:
+                bins, sizes = lattice
+                # Rough operation counts of the direct sum and of the FFT
+                direct_cost = len(k) * np.prod([len(axis) for axis in axes])
+                fft_cost = 5 * np.prod(sizes) * np.log2(np.prod(sizes))
+                if method == "fft" or direct_cost > fft_cost:
+                    return FFTModeSet(
+                        k, axes, bins, sizes, omegas, amps, pol, dtype=dtype
+                    )
+        basis = _plane_wave_basis(k, axes, amps, pol)
+        return cls(basis, omegas, dtype=dtype)
+
+    def __len__(self):
+        return len(self.omegas)
+
+    def time_factors(self, t):
+        """(T, M) table of c_n e^{-i w_n t}."""
+        t = np.atleast_1d(np.asarray(t, dtype=float))
+        return (self.coeffs * np.exp(-1j * np.outer(t, self.omegas))).astype(self.dtype)
+
+    def evaluate(self, t):
+        """Complex field for every time in t, shape (T, ...), or (...) for a scalar t."""
+        out = (self.time_factors(t) @ self.basis).reshape(-1, *self.shape)
+        return out[0] if np.ndim(t) == 0 else out
+
+    def parts(self, t, index=None):
+        """
+        Each mode's own contribution, shape (T, M, ...), or (M, ...) for a scalar t.
+
+        index picks positions along the first spatial axis (e.g. 0 for x[0]), so
+        single points don't need the whole grid.
+        """
+        basis = self.basis.reshape(len(self), *self.shape)
+        if index is not None:
+            basis = basis[:, index]
+        factors = self.time_factors(t)
+        out = factors.reshape(*factors.shape, *(1,) * (basis.ndim - 1)) * basis
+        return out[0] if np.ndim(t) == 0 else out
+
+
+def animation_period(omegas, tol=1e-9, max_denominator=1000, max_cycles=50):
+    """
+    Duration after which an animation of modes with frequencies omegas loops.
+
+    The superposition repeats after T = 2pi / gcd(omegas), found by rationalizing
+    the frequency ratios (within a relative tol, denominators up to
+    max_denominator). If there is no such period, or it is longer than max_cycles
+    periods of the slowest mode, the period of the slowest beat
+    2pi / min|w_i - w_j| is used instead. Frequencies of 0 don't move anything and
+    are ignored, without any moving mode the result is 2pi.
+    """
+    w = np.unique(np.abs(np.asarray(omegas, dtype=float)))
+    w = w[w > 0]
+    if w.size == 0:
+        return 2 * np.pi
+    # Frequencies that only differ by rounding count as one
+    w = w[np.concatenate([[True], np.diff(w) > tol * w[1:]])]
+    ratios = w / w[0]
+    fracs = [Fraction(r).limit_denominator(max_denominator) for r in ratios]
+    if all(abs(float(fr) - r) <= tol * r for fr, r in zip(fracs, ratios)):
+        # w_n = (w_0 / denom) * m_n with integer m_n
+        denom = math.lcm(*(fr.denominator for fr in fracs))
+        steps = math.gcd(*(fr.numerator * denom // fr.denominator for fr in fracs))
+        period = 2 * np.pi * denom / (steps * w[0])
+        if period * w[0] / (2 * np.pi) <= max_cycles * (1 + tol):
+            return period
+    return 2 * np.pi / np.diff(w).min()
+
+
+def plan_frames(omegas, period, frames_per_cycle=24, min_frames=2, max_frames=2000):
+    """
+    Number of frames and the time span for an animation of length period.
+
+    Enough frames to sample the fastest mode frames_per_cycle times per
+    oscillation, at least min_frames. Returns (num_frames, span), meant for
+    np.linspace(0, span, num_frames, endpoint=False), so the loop doesn't show
+    the same frame twice. span is period unless that would take more than
+    max_frames: fewer frames would alias the fast modes, so the span is cut to
+    the whole cycles of the fastest mode that max_frames can sample (at least
+    one), with a warning, as the animation no longer loops seamlessly then.
+    """
+    fastest = np.max(np.abs(np.asarray(omegas, dtype=float)), initial=0)
+    num_frames = math.ceil(period * fastest / (2 * np.pi) * frames_per_cycle - 1e-9)
+    if num_frames <= max_frames:
+        return max(num_frames, min_frames), period
+    cycles = max(max_frames // frames_per_cycle, 1)
+    span = cycles * 2 * np.pi / fastest
+    warnings.warn(
+        f"{num_frames} frames needed for the whole loop of {period:.4g}, more than "
+        f"max_frames={max_frames}; animating {cycles} cycles of the fastest mode "
+        f"({span:.4g}) instead",
+        stacklevel=2,
+    )
+    return max_frames, span
+
+
+def _wave_vectors(k_values, x):
+    # k as (M, ndim) and the grid axes as a tuple, for 1D or 2D grids
+    axes = x if isinstance(x, tuple) else (x,)
+    axes = tuple(np.asarray(axis, dtype=float) for axis in axes)
+    k = np.asarray(k_values, dtype=float).reshape(-1, len(axes))
+    return k, axes
+
+
+def _plane_wave_basis(k, axes, amps, pol=None, index=None):
+    # amps e^{ik.r} (times pol) on the grid, or only at grid[index] along the
+    # first grid axis (y for 2D grids, like np.meshgrid)
+    coords = np.meshgrid(*axes) if len(axes) > 1 else list(axes)
+    if index is not None:
+        coords = [coord[index] for coord in coords]
+    shape = (-1,) + (1,) * np.ndim(coords[0])
+    kdotr = sum(k[:, d].reshape(shape) * coord for d, coord in enumerate(coords))
+    basis = amps.reshape(shape) * np.exp(1j * kdotr)
+    if pol is not None:
+        basis = basis[..., None] * pol.reshape(
+            pol.shape[:1] + shape[1:] + pol.shape[1:]
+        )
+    return basis
+
+
+def lattice_bins(k_values, x, tol=1e-9, max_size=None):
+    """
+    FFT lattice indices of plane waves on a uniform grid.
+
+    On an axis with spacing dx, e^{ik x_j} = e^{ik x_0} e^{2 pi i n j / L} whenever
+    k dx / 2pi = n / L, so the plane waves are one inverse FFT of length L. This
+    finds the smallest such L >= len(axis) for every axis, allowing a total phase
+    error of tol across the grid. x is the grid like in ModeSet.plane_waves.
+
+    Returns (bins, sizes) with bins (num_modes, ndim) and sizes the FFT lengths,
+    or None if an axis isn't uniform or needs L > max_size (default 64 * len(axis)).
+    """
+    k, axes = _wave_vectors(k_values, x)
+    bins = []
+    sizes = []
+    for d, axis in enumerate(axes):
+        n = len(axis)
+        if n < 2:
+            return None
+        dx = (axis[-1] - axis[0]) / (n - 1)
+        if not np.allclose(np.diff(axis), dx, rtol=1e-9, atol=0):
+            return None
+        limit = max_size or 64 * n
+        f = k[:, d] * dx / (2 * np.pi)
+        size = 1
+        for value in f:
+            size = math.lcm(size, Fraction(value).limit_denominator(limit).denominator)
+            if size > limit:
+                return None
+        size *= -(-n // size)
+        if size > limit:
+            return None
+        idx = np.rint(f * size)
+        if np.max(np.abs(f * size - idx), initial=0) * 2 * np.pi * n / size > tol:
+            return None
+        bins.append(idx.astype(np.intp) % size)
+        sizes.append(size)
+    return np.stack(bins, axis=1), tuple(sizes)
+
+
+class FFTModeSet(ModeSet):
+    """
+    Plane waves on the FFT lattice of a uniform grid, see ModeSet.plane_waves.
+
+    evaluate() drops the mode coefficients into their lattice bins and
+    synthesizes the field with an inverse FFT, O(N log N) per frame however many
+    modes there are. The bases are never stored, parts() computes them for the
+    requested points only.
+    """
+
+    def __init__(
+        self,
+        k,
+        axes,
+        bins,
+        sizes,
+        omegas,
+        amps,
+        pol=None,
+        coeffs=1.0,
+        dtype=np.complex128,
+    ):
+        self.dtype = np.dtype(dtype)
+        self.k = k
+        self.axes = axes
+        self.bins = bins
+        self.sizes = sizes
+        self.amps = amps
+        self.pol = pol
+        # Grid axes in np.meshgrid order, i.e. (y, x) for 2D
+        grid = tuple(len(axis) for axis in axes[::-1])
+        self.shape = grid + (() if pol is None else (pol.shape[1],))
+        self.omegas = np.asarray(omegas, dtype=float)
+        self.coeffs = np.broadcast_to(
+            np.asarray(coeffs, dtype=complex), self.omegas.shape
+        )
+        # Spectrum weight of each mode: amplitude, phase at the grid origin, polarization
+        origin = sum(k[:, d] * axis[0] for d, axis in enumerate(axes))
+        weights = amps * np.exp(1j * origin)
+        self._weights = weights[:, None] if pol is None else weights[:, None] * pol
+        self._bin_index = tuple(bins.T[::-1])
+
+    @property
+    def basis(self):
+        basis = _plane_wave_basis(self.k, self.axes, self.amps, self.pol)
+        return basis.astype(self.dtype).reshape(len(self), -1)
+
+    def evaluate(self, t):
+        factors = self.time_factors(t)  # (T, M)
+        values = factors.T[:, :, None] * self._weights[:, None, :]  # (M, T, P)
+        ndim = len(self.sizes)
+        spectrum = np.zeros(self.sizes[::-1] + values.shape[1:], dtype=complex)
+        np.add.at(spectrum, self._bin_index, values)
+        field = np.fft.ifftn(spectrum, axes=range(ndim), norm="forward")
+        field = field[tuple(slice(0, n) for n in self.shape[:ndim])]
+        # (*grid, T, P) -> (T, *grid, P)
+        field = np.moveaxis(field, ndim, 0)
+        if self.pol is None:
+            field = field[..., 0]
+        out = field.astype(self.dtype)
+        return out[0] if np.ndim(t) == 0 else out
+
+    def parts(self, t, index=None):
+        basis = _plane_wave_basis(self.k, self.axes, self.amps, self.pol, index)
+        factors = self.time_factors(t)
+        out = factors.reshape(*factors.shape, *(1,) * (basis.ndim - 1)) * basis
+        out = out.astype(self.dtype)
+        return out[0] if np.ndim(t) == 0 else out
+
+
+def polarization_fields(modes, t_vals, arrow_index=0):
+    """
+    Real polarization field 2 Re[E] of a ModeSet.plane_waves mode set.
+
+    Returns
+        field       (num_frames, num_x, 2)  total (y, z) field at every x
+        mode_arrows (num_frames, num_modes, 2)  each mode's (y, z) field at x[arrow_index]
+    """
+    field = 2 * modes.evaluate(t_vals).real
+    mode_arrows = 2 * modes.parts(t_vals, index=arrow_index).real
+    return field, mode_arrows
+
+
+def superpose_modes(k_values, polarizations, amps, x, t_vals, c=1.0, arrow_index=0):
+    """
+    Evaluate the total polarization field for all frames in one go.
+
+    Shorthand for polarization_fields() on ModeSet.plane_waves(); build the mode
+    set once yourself when evaluating many batches of times.
+    """
+    modes = ModeSet.plane_waves(k_values, x, polarizations, amps, c=c)
+    return polarization_fields(modes, t_vals, arrow_index)
@@ -0,0 +1,244 @@
+import atexit
+import json
+import math
+import os
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+
+# Stage timings for the frame pipelines, off unless switched on.
+#
+#   FIELD_PROFILE=1 python 1D_Efield_vis.py
+#
+# records how long every stage took (mode evaluation, trace building, figure,
+# write_html, show, Matplotlib draw, ffmpeg encode, ...) and the time between
+# consecutive frames. At exit a summary table goes to stderr and a Chrome trace
+# to FIELD_PROFILE_OUT (default profile_trace.json), to be opened in
+# chrome://tracing or ui.perfetto.dev.
+# FIELD_PROFILE=memory also tracks the peak of temporary allocations (NumPy
+# arrays included) within each stage through tracemalloc, which slows the run
+# down noticeably.
+# Code can switch it on with enable() instead. Work done in worker processes
+# shows up as the time spent waiting for its results.
+
+_NULL = nullcontext()
+
+
+class Profiler:
+    """
+    Stage and frame timings of one run, see stage(), frame() and report().
+
+    With memory=True every stage also records how far the traced memory rose
+    above its level at the start of the stage, i.e. the stage's temporaries.
+    """
+
+    def __init__(self, path="profile_trace.json", memory=False):
+        self.path = path
+        self.memory = memory
+        self.stats = {}  # name -> [calls, seconds, max seconds, max temp bytes]
+        self.events = []  # (name, start, duration, thread)
+        self.frame_times = []
+        self._start = time.perf_counter()
+        self._last_frame = None
+        self._stack = []
+        if memory:
+            import tracemalloc
+
+            self._tracemalloc = tracemalloc
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name):
+        if self.memory:
+            current, peak = self._tracemalloc.get_traced_memory()
+            if self._stack:
+                # The enclosing stage keeps the peak reached so far
+                self._stack[-1][1] = max(self._stack[-1][1], peak)
+            self._tracemalloc.reset_peak()
+            self._stack.append([current, current])
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            temp = 0
+            if self.memory:
+                base, peak = self._stack.pop()
+                peak = max(peak, self._tracemalloc.get_traced_memory()[1])
+                temp = peak - base
+                if self._stack:
+                    self._stack[-1][1] = max(self._stack[-1][1], peak)
+            stats = self.stats.setdefault(name, [0, 0.0, 0.0, 0])
+            stats[0] += 1
+            stats[1] += duration
+            stats[2] = max(stats[2], duration)
+            stats[3] = max(stats[3], temp)
+            self.events.append((name, start, duration, len(self._stack)))
+
+    def frame(self):
+        """Mark a finished frame; the latency is the time since the last one."""
+        now = time.perf_counter()
+        last = self._start if self._last_frame is None else self._last_frame
+        self.frame_times.append(now - last)
+        self.events.append((f"frame {len(self.frame_times) - 1}", last, now - last, -1))
+        self._last_frame = now
+
+    def summary(self):
+        """The summary table and frame latency histogram as text."""
+        wall = time.perf_counter() - self._start
+        lines = [f"{'stage':<28} {'calls':>7} {'total s':>9} {'mean ms':>9}"]
+        lines[0] += f" {'max ms':>9} {'% wall':>7}"
+        if self.memory:
+            lines[0] += f" {'temp MB':>8}"
+        by_total = sorted(self.stats.items(), key=lambda item: -item[1][1])
+        for name, (calls, total, longest, temp) in by_total:
+            line = f"{name:<28} {calls:7d} {total:9.3f} {1e3 * total / calls:9.2f}"
+            line += f" {1e3 * longest:9.2f} {100 * total / wall:6.1f}%"
+            if self.memory:
+                line += f" {temp / 1024**2:8.1f}"
+            lines.append(line)
+        lines.append(f"{'wall':<28} {'':>7} {wall:9.3f}")
+        if self.frame_times:
+            lines += [""] + self._frame_histogram()
+        return "\n".join(lines)
+
+    def _frame_histogram(self):
+        # The first frame includes all the setup, the histogram is over the rest
+        first, rest = self.frame_times[0], sorted(self.frame_times[1:])
+        lines = [f"frames: {len(self.frame_times)}, first after {1e3 * first:.1f} ms"]
+        if not rest:
+            return lines
+        pct = {
+            p: rest[min(int(p / 100 * len(rest)), len(rest) - 1)] for p in (50, 90, 99)
+        }
+        lines.append(
+            "latency ms: "
+            + ", ".join(f"p{p} {1e3 * v:.2f}" for p, v in pct.items())
+            + f", max {1e3 * rest[-1]:.2f}"
+        )
+        # Power of two bins in ms
+        bins = {}
+        for t in rest:
+            b = math.floor(math.log2(max(t * 1e3, 1e-3)))
+            bins[b] = bins.get(b, 0) + 1
+        widest = max(bins.values())
+        for b in range(min(bins), max(bins) + 1):
+            count = bins.get(b, 0)
+            label = f"{2.0**b:g}-{2.0 ** (b + 1):g} ms"
+            lines.append(f"  {label:>16} {count:6d} {'#' * round(40 * count / widest)}")
+        return lines
+
+    def chrome_trace(self):
+        """The stages and frames as Chrome trace events (times in microseconds)."""
+        pid = os.getpid()
+        events = [
+            dict(name="thread_name", ph="M", pid=pid, tid=0, args=dict(name="stages")),
+            dict(name="thread_name", ph="M", pid=pid, tid=1, args=dict(name="frames")),
+        ]
+        for name, start, duration, depth in self.events:
+            events.append(
+                dict(
+                    name=name,
+                    cat="frame" if depth < 0 else "stage",
+                    ph="X",
+                    pid=pid,
+                    tid=1 if depth < 0 else 0,
+                    ts=1e6 * (start - self._start),
+                    dur=1e6 * duration,
+                )
+            )
+        return dict(traceEvents=events, displayTimeUnit="ms")
+
+    def report(self):
+        """Print the summary to stderr and write the Chrome trace to path."""
+        print(self.summary(), file=sys.stderr)
+        if self.path:
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(self.chrome_trace(), f)
+            print(f"Chrome trace written to {self.path}", file=sys.stderr)
+
+
+_profiler = None
+
+
+def enable(path="profile_trace.json", memory=False, report=True):
+    """
+    Start profiling this process, reported at exit. Returns the Profiler.
+
+    report=False leaves reading the Profiler's stats to the caller.
+    """
+    global _profiler
+    if _profiler is None:
+        _profiler = Profiler(path, memory)
+        if report:
+            atexit.register(_report, os.getpid())
+    return _profiler
+
+
+def _report(pid):
+    # Forked workers inherit the atexit hook, only the process that enabled reports
+    if os.getpid() == pid:
+        _profiler.report()
+
+
+def enabled():
+    return _profiler is not None
+
+
+def stage(name):
+    """Context manager timing the stage name, a no-op when profiling is off."""
+    if _profiler is None:
+        return _NULL
+    return _profiler.stage(name)
+
+
+def frame():
+    """Mark the end of a frame, see Profiler.frame()."""
+    if _profiler is not None:
+        _profiler.frame()
+
+
+def timed(name, iterable):
+    """Iterate over iterable, timing every step as the stage name."""
+    if _profiler is None:
+        return iterable
+    return _timed(name, iterable)
+
+
+def _timed(name, iterable):
+    it = iter(iterable)
+    while True:
+        with _profiler.stage(name):
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+        yield item
+
+
+def wrap(obj, attr, name):
+    """Time every call of the method obj.attr as the stage name (when profiling)."""
+    if _profiler is None:
+        return
+    method = getattr(obj, attr)
+
+    def timed_method(*args, **kwargs):
+        with _profiler.stage(name):
+            return method(*args, **kwargs)
+
+    setattr(obj, attr, timed_method)
+
+
+def _from_environment():
+    setting = os.environ.get("FIELD_PROFILE", "")
+    if setting in ("", "0"):
+        return
+    import multiprocessing
+
+    # Spawned workers import this too, the parent process does the reporting
+    if multiprocessing.parent_process() is None:
+        path = os.environ.get("FIELD_PROFILE_OUT", "profile_trace.json")
+        enable(path, memory=setting == "memory")
+
+
+_from_environment()
@@ -0,0 +1,228 @@
+import subprocess
+
+import numpy as np
+
+from . import profiling
+from .frame_pool import map_frames
+from .profiling import stage, timed
+
+# Headless video output without going through Matplotlib's canvas.
+# Field arrays (line plots, heatmaps, quiver fields) are rasterized with NumPy
+# straight into preallocated RGB buffers, and the frames are piped to a local
+# ffmpeg process as raw video.
+
+
+class FFmpegPipe:
+    """
+    Pipe raw RGB frames into a local ffmpeg process.
+
+    Frames are (height, width, 3) uint8 arrays. width and height should be even
+    for the default yuv420p output. encoder_args go after the codec, the default
+    ones are for libx264.
+    """
+
+    def __init__(
+        self,
+        path,
+        width,
+        height,
+        fps=30,
+        codec="libx264",
+        encoder_args=("-crf", "18", "-preset", "veryfast"),
+        ffmpeg="ffmpeg",
+    ):
+        self.width = width
+        self.height = height
+        cmd = [
+            ffmpeg,
+            "-y",
+            "-loglevel",
+            "error",
+            "-f",
+            "rawvideo",
+            "-pix_fmt",
+            "rgb24",
+            "-s",
+            f"{width}x{height}",
+            "-r",
+            str(fps),
+            "-i",
+            "-",
+            "-an",
+            "-c:v",
+            codec,
+            *encoder_args,
+            "-pix_fmt",
+            "yuv420p",
+            path,
+        ]
+        self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+
+    def write(self, frame):
+        if frame.shape != (self.height, self.width, 3) or frame.dtype != np.uint8:
+            raise ValueError(
+                f"Expected a ({self.height}, {self.width}, 3) uint8 frame, "
+                f"got {frame.shape} {frame.dtype}"
+            )
+        with stage("ffmpeg encode"):
+            self._proc.stdin.write(np.ascontiguousarray(frame).data)
+
+    def close(self):
+        if self._proc.stdin.closed:
+            return
+        with stage("ffmpeg encode"):
+            self._proc.stdin.close()
+            code = self._proc.wait()
+        if code:
+            raise RuntimeError(f"ffmpeg exited with code {code}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def colormap_lut(name="viridis", n=256):
+    """(n, 3) uint8 lookup table for a Matplotlib colormap."""
+    import matplotlib
+
+    return (matplotlib.colormaps[name](np.linspace(0, 1, n))[:, :3] * 255).astype(
+        np.uint8
+    )
+
+
+class Canvas:
+    """
+    One plot area inside an RGB frame buffer, with a data -> pixel mapping.
+
+    rgb is a (height, width, 3) uint8 array or a view into a bigger frame, so a
+    frame with several panels is just several canvases on slices of one buffer.
+    Everything is drawn in place, nothing is allocated per frame except small
+    index arrays.
+    """
+
+    def __init__(self, rgb, xlim, ylim, background=(255, 255, 255)):
+        self.rgb = rgb
+        self.height, self.width = rgb.shape[:2]
+        self.xlim = xlim
+        self.ylim = ylim
+        self.background = np.array(background, dtype=np.uint8)
+        self._rows = np.arange(self.height)[:, None]
+        self._heatmap_index = {}
+
+    def clear(self):
+        self.rgb[...] = self.background
+
+    def to_px(self, x, y):
+        """Data coordinates -> (column, row) pixel coordinates as floats."""
+        (x0, x1), (y0, y1) = self.xlim, self.ylim
+        col = (np.asarray(x) - x0) / (x1 - x0) * (self.width - 1)
+        row = (y1 - np.asarray(y)) / (y1 - y0) * (self.height - 1)
+        return col, row
+
+    def heatmap(self, Z, vmin, vmax, lut):
+        """Fill the canvas with Z (rows along y, first row at ylim[0]) through lut."""
+        key = Z.shape
+        if key not in self._heatmap_index:
+            # Nearest neighbour resampling, computed once per grid shape
+            ny, nx = Z.shape
+            rows = (ny - 1 - np.arange(self.height) * ny // self.height)[:, None]
+            cols = (np.arange(self.width) * nx // self.width)[None, :]
+            self._heatmap_index[key] = (rows, cols)
+        rows, cols = self._heatmap_index[key]
+        scaled = (Z[rows, cols] - vmin) * ((len(lut) - 1) / (vmax - vmin))
+        idx = np.clip(scaled, 0, len(lut) - 1).astype(np.intp)
+        np.take(lut, idx, axis=0, out=self.rgb)
+
+    def hline(self, y, color, every=1):
+        _, row = self.to_px(0, y)
+        row = int(round(float(row)))
+        if 0 <= row < self.height:
+            self.rgb[row, ::every] = color
+
+    def vline(self, x, color, every=1):
+        col, _ = self.to_px(x, 0)
+        col = int(round(float(col)))
+        if 0 <= col < self.width:
+            self.rgb[::every, col] = color
+
+    def grid(self, xticks, yticks, color=(220, 220, 220)):
+        for x in xticks:
+            self.vline(x, color)
+        for y in yticks:
+            self.hline(y, color)
+
+    def line(self, x, y, color, width=1, dash=None):
+        """
+        Draw y(x) for increasing x as a connected line.
+
+        Each pixel column gets the interpolated y value and is filled between
+        its own and its neighbour's row, so steep parts stay connected. dash is
+        an optional (on, off) pattern in pixel columns.
+        """
+        cols = np.arange(self.width)
+        x0, x1 = self.xlim
+        xc = x0 + cols * (x1 - x0) / (self.width - 1)
+        _, row = self.to_px(xc, np.interp(xc, x, y, left=np.nan, right=np.nan))
+        prev = np.concatenate([row[:1], row[:-1]])
+        half = (width - 1) / 2
+        lo = np.fmin(row, prev) - half
+        hi = np.fmax(row, prev) + half
+        if np.isnan(lo).all():
+            return
+        # Only look at the band of rows the line actually crosses
+        top = max(int(np.nanmin(np.floor(lo))), 0)
+        bottom = min(int(np.nanmax(np.ceil(hi))) + 1, self.height)
+        rows = self._rows[top:bottom]
+        mask = (rows >= np.floor(lo)) & (rows <= np.ceil(hi))
+        if dash is not None:
+            on, off = dash
+            mask &= (cols % (on + off) < on)[None, :]
+        self.rgb[top:bottom][mask] = color
+
+    def segments(self, x0, y0, x1, y1, color, head=0.0):
+        """
+        Draw straight segments from (x0, y0) to (x1, y1), e.g. quiver arrows.
+
+        head is the arrowhead length as a fraction of each segment, 0 for none.
+        """
+        c0, r0 = self.to_px(np.ravel(x0), np.ravel(y0))
+        c1, r1 = self.to_px(np.ravel(x1), np.ravel(y1))
+        if head:
+            # Two short strokes back from the tip, +-25 degrees off the shaft
+            dc, dr = c0 - c1, r0 - r1
+            starts_c, starts_r, ends_c, ends_r = [c0], [r0], [c1], [r1]
+            for angle in (0.44, -0.44):
+                cos, sin = np.cos(angle), np.sin(angle)
+                starts_c.append(c1)
+                starts_r.append(r1)
+                ends_c.append(c1 + head * (cos * dc - sin * dr))
+                ends_r.append(r1 + head * (sin * dc + cos * dr))
+            c0, r0 = np.concatenate(starts_c), np.concatenate(starts_r)
+            c1, r1 = np.concatenate(ends_c), np.concatenate(ends_r)
+        n = int(np.ceil(np.nanmax(np.hypot(c1 - c0, r1 - r0), initial=0))) + 1
+        s = np.linspace(0, 1, n)[None, :]
+        cols = np.rint(c0[:, None] + s * (c1 - c0)[:, None]).astype(np.intp)
+        rows = np.rint(r0[:, None] + s * (r1 - r0)[:, None]).astype(np.intp)
+        inside = (cols >= 0) & (cols < self.width) & (rows >= 0) & (rows < self.height)
+        self.rgb[rows[inside], cols[inside]] = color
+
+
+def write_video(
+    path, render_frame, num_frames, width, height, fps=30, workers=1, chunksize=4, **kw
+):
+    """
+    Render num_frames frames with render_frame(i) and encode them with ffmpeg.
+
+    render_frame returns a (height, width, 3) uint8 array. With workers > 1 the
+    frames are rasterized in a process pool (see frame_pool.py) and still written
+    in order. Extra keyword arguments go to FFmpegPipe.
+    """
+    with FFmpegPipe(path, width, height, fps=fps, **kw) as pipe:
+        frames = map_frames(
+            render_frame, range(num_frames), workers=workers, chunksize=chunksize
+        )
+        for frame in timed("rasterize", frames):
+            pipe.write(frame)
+            profiling.frame()
@@ -0,0 +1,235 @@
+import hashlib
+import importlib.metadata
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+import numpy as np
+
+from . import __version__
+
+# On-disk cache for simulation results and rendered outputs.
+# Entries are directories named after a hash of everything that went into them
+# (physics and grid parameters for field arrays, plus the styling for rendered
+# files), so a rerun with the same parameters finds its results again and a
+# styling change only misses the rendered files, not the physics.
+# The cache is kept below max_bytes by dropping the least recently used entries.
+# Every key also includes the code that produced the entry: the fieldsim version
+# and sources, the Plotly version and the source of the calling script, so
+# editing a script or upgrading a library never serves a stale result.
+
+
+def _update_hash(h, value):
+    # Feed value into the hash unambiguously: type tags, exact array bytes
+    if isinstance(value, dict):
+        h.update(b"d%d" % len(value))
+        for key in sorted(value, key=str):
+            _update_hash(h, str(key))
+            _update_hash(h, value[key])
+    elif isinstance(value, (list, tuple)):
+        h.update(b"l%d" % len(value))
+        for item in value:
+            _update_hash(h, item)
+    elif isinstance(value, np.ndarray):
+        arr = np.ascontiguousarray(value)
+        h.update(f"a{arr.dtype.str}{arr.shape}".encode())
+        h.update(arr.tobytes())
+    elif isinstance(value, str):
+        h.update(b"s%d:" % len(value.encode()))
+        h.update(value.encode())
+    elif isinstance(value, np.dtype) or (
+        isinstance(value, type) and issubclass(value, np.generic)
+    ):
+        # np.float32 and np.dtype("float32") are the same dtype
+        h.update(f"t{np.dtype(value).str};".encode())
+    elif isinstance(value, type) and issubclass(value, np.dtype):
+        # dtype classes, e.g. type(np.dtype("float32"))
+        h.update(f"t{np.dtype(value.type).str};".encode())
+    elif isinstance(value, type):
+        _update_hash(h, f"{value.__module__}.{value.__qualname__}")
+    elif value is None or isinstance(value, (bool, int, float, complex, np.generic)):
+        h.update(f"v{type(value).__name__}:{value!r};".encode())
+    else:
+        raise TypeError(f"Can't hash {type(value).__name__} for a cache key")
+
+
+def _package_version(name):
+    try:
+        return importlib.metadata.version(name)
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
+
+def _source_hash(paths):
+    # Contents of the given source files, in order
+    h = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            data = f.read()
+        h.update(b"%d:" % len(data))
+        h.update(data)
+    return h.hexdigest()
+
+
+def code_salt(source=None):
+    """
+    What every key of a cache depends on besides its parameters.
+
+    The fieldsim version and a hash of its modules, the Plotly version (without
+    importing Plotly) and a hash of the file source, e.g. the calling script.
+    """
+    package = os.path.dirname(os.path.abspath(__file__))
+    modules = sorted(
+        os.path.join(package, name)
+        for name in os.listdir(package)
+        if name.endswith(".py")
+    )
+    return dict(
+        fieldsim=__version__,
+        fieldsim_source=_source_hash(modules),
+        plotly=_package_version("plotly"),
+        source=_source_hash([source]) if source else None,
+    )
+
+
+class ResultCache:
+    """
+    Cache of field arrays and files in the directory root.
+
+    key() turns parameters into an entry name. load() and fetch_file() look
+    entries up, entry() and store_file() create them. Entries over max_bytes in
+    total are evicted, least recently used first. source is the file of the
+    script using the cache (pass __file__), its contents are part of every key
+    along with the library versions, see code_salt().
+    """
+
+    def __init__(self, root=".field_cache", max_bytes=2 * 1024**3, source=None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.salt = code_salt(source)
+        os.makedirs(root, exist_ok=True)
+
+    def key(self, *parts, **params):
+        """Hash of parts and params: dicts, lists, strings, numbers and arrays."""
+        h = hashlib.sha256()
+        _update_hash(h, [self.salt, list(parts), params])
+        return h.hexdigest()[:32]
+
+    def _path(self, key):
+        return os.path.join(self.root, key)
+
+    def _touch(self, path):
+        os.utime(path)
+
+    def load(self, key):
+        """The arrays stored under key as {name: memory-mapped array}, or None."""
+        path = self._path(key)
+        if not os.path.isdir(path):
+            return None
+        self._touch(path)
+        return {
+            name[:-4]: np.load(os.path.join(path, name), mmap_mode="r")
+            for name in sorted(os.listdir(path))
+            if name.endswith(".npy")
+        }
+
+    def fetch_file(self, key, dest):
+        """Copy the file stored under key to dest. False if there is none."""
+        path = os.path.join(self._path(key), "output")
+        if not os.path.isfile(path):
+            return False
+        self._touch(self._path(key))
+        shutil.copyfile(path, dest)
+        return True
+
+    def store_file(self, key, src):
+        """Store a copy of the file src (e.g. a rendered HTML page) under key."""
+        with self.entry(key) as entry:
+            entry.add_file(src, "output")
+
+    @contextmanager
+    def entry(self, key):
+        """
+        Create the entry key, filled inside the with block.
+
+        The entry is written to a temporary directory and only moved into place
+        when the block finishes without an error, so an interrupted run never
+        leaves a partial entry behind. An existing entry is replaced.
+        """
+        tmp = tempfile.mkdtemp(prefix=".tmp-", dir=self.root)
+        try:
+            yield CacheEntry(tmp)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        path = self._path(key)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp, path)
+        self.evict(keep=key)
+
+    def evict(self, keep=None):
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        for name in os.listdir(self.root):
+            path = self._path(name)
+            if name.startswith(".tmp-") or not os.path.isdir(path):
+                continue
+            size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+            entries.append((os.path.getmtime(path), size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if name != keep:
+                shutil.rmtree(self._path(name), ignore_errors=True)
+                total -= size
+
+
+class CacheEntry:
+    """A cache entry being written, see ResultCache.entry()."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def array(self, name, shape, dtype):
+        """New zeroed array name.npy in the entry, memory-mapped for filling."""
+        return np.lib.format.open_memmap(
+            os.path.join(self.path, name + ".npy"),
+            mode="w+",
+            dtype=dtype,
+            shape=tuple(shape),
+        )
+
+    def add_file(self, src, name=None):
+        """Copy the file src into the entry."""
+        shutil.copyfile(src, os.path.join(self.path, name or os.path.basename(src)))
+
+
+def store_chunks(cache, key, chunks, num_frames, names, select=None):
+    """
+    Pass chunks of per-frame results through while storing them under key.
+
+    select(chunk) gives the arrays to store, one per name, each covering the
+    next frames along its first axis (default: the chunk itself, a tuple of
+    arrays). The entry is only committed once all num_frames frames went
+    through, so it is only kept for complete runs.
+    """
+    with cache.entry(key) as entry:
+        arrays = None
+        start = 0
+        for chunk in chunks:
+            parts = chunk if select is None else select(chunk)
+            if arrays is None:
+                arrays = [
+                    entry.array(name, (num_frames, *np.shape(part)[1:]), part.dtype)
+                    for name, part in zip(names, parts)
+                ]
+            for arr, part in zip(arrays, parts):
+                arr[start : start + len(part)] = part
+            start += len(parts[0])
+            yield chunk
+        if start != num_frames:
+            raise ValueError(f"Expected {num_frames} frames, got {start}")
+        for arr in arrays or []:
+            arr.flush()
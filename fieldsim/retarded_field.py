@@ -0,0 +1,326 @@
+import numpy as np
+
+from .trajectory import Circle
+
+# Grid-at-once version of the radiation field used in 2D_fun.py.
+# Same formulas as the old per-cell loop, just applied to whole arrays.
+# The charge circles the origin (radius r0, angular frequency w0) unless another
+# path is passed as trajectory=, see trajectory.py.
+
+
+def particle_pos(t, r0, w0):
+    """Position of the charge on its circle of radius r0 at time(s) t."""
+    return Circle(r0, w0).position(t)
+
+
+def particle_vel(t, r0, w0):
+    """Velocity of the charge on its circle at time(s) t."""
+    return Circle(r0, w0).velocity(t)
+
+
+def _frame_axis(t, X):
+    # Broadcast the frame axis in front of the grid axes
+    t = np.asarray(t, dtype=float)
+    return t.reshape(t.shape + (1,) * X.ndim)
+
+
+def solve_retarded_time(
+    X,
+    Y,
+    t,
+    r0=1.5,
+    w0=2.0,
+    c=1.0,
+    method="newton",
+    tol=1e-10,
+    max_iter=50,
+    trajectory=None,
+):
+    """
+    Solve t' = t - |r - r'(t')|/c for every grid cell (and every frame if t is an array).
+
+    method="fixed_point" iterates the equation directly, method="newton" uses Newton
+    steps on f(t') = t' - t + |r - r'(t')|/c, safeguarded by bisection.
+    Both start from the one-step approximation.
+    A cell has converged once its residual |f(t')| is below tol and then drops
+    out of the iteration. Cells whose Newton bracket shrinks to nothing without
+    getting there (no root in it) drop out unconverged, like the ones still
+    iterating after max_iter sweeps.
+
+    Returns (tret, info). info has the number of converged cells, the total number
+    of cells, the number of sweeps done and the per-cell iteration counts.
+    trajectory replaces the circle of r0, w0 by any path from trajectory.py.
+    """
+    if method not in ("fixed_point", "newton"):
+        raise ValueError(f"Unknown retarded time method: {method}")
+    if trajectory is None:
+        trajectory = Circle(r0, w0)
+
+    t = _frame_axis(t, X)
+    shape = np.broadcast_shapes(t.shape, X.shape)
+    tb = np.broadcast_to(t, shape).ravel()
+    Xb = np.broadcast_to(X, shape).ravel()
+    Yb = np.broadcast_to(Y, shape).ravel()
+
+    # Initial guess: t' = t - |r - r'(t)|/c
+    xp, yp = trajectory.position(tb)
+    tret = tb - np.sqrt((Xb - xp) ** 2 + (Yb - yp) ** 2) / c
+    # The root is bracketed by the nearest and farthest the charge can ever be.
+    # Newton steps that leave the bracket are replaced by bisection, which keeps
+    # things sane when the charge moves faster than c and there are several roots.
+    r_obs = np.sqrt(Xb**2 + Yb**2)
+    radius = trajectory.radius
+    lo = tb - (r_obs + radius) / c
+    hi = tb - np.maximum(r_obs - radius, 0.0) / c
+
+    iters = np.zeros(tret.size, dtype=int)
+    converged = np.zeros(tret.size, dtype=bool)
+    active = np.arange(tret.size)
+    sweeps = 0
+    while active.size and sweeps < max_iter:
+        tr = tret[active]
+        xa = Xb[active]
+        ya = Yb[active]
+        xpr, ypr = trajectory.position(tr)
+        dxr = xa - xpr
+        dyr = ya - ypr
+        r_retdist = np.sqrt(dxr**2 + dyr**2)
+        # Fixed-point map g(t') = t - |r - r'(t')|/c, the residual f = t' - g(t')
+        new = tb[active] - r_retdist / c
+        f = tr - new
+        iters[active] += 1
+        sweeps += 1
+        # Converged on the residual, not the step size: a bisection in a bracket
+        # without a root takes ever smaller steps too
+        done = np.abs(f) < tol
+        converged[active[done]] = True
+        keep = ~done
+        if method == "newton":
+            lo_a = np.where(f < 0, tr, lo[active])
+            hi_a = np.where(f < 0, hi[active], tr)
+            lo[active] = lo_a
+            hi[active] = hi_a
+            vx, vy = trajectory.velocity(tr)
+            fprime = 1 - (dxr * vx + dyr * vy) / (c * (r_retdist + 1e-12))
+            ok = np.abs(fprime) > 1e-6
+            new = tr - f / np.where(ok, fprime, 1.0)
+            inside = ok & (new > lo_a) & (new < hi_a)
+            new = np.where(inside, new, 0.5 * (lo_a + hi_a))
+            # A bracket shrunk to nothing with the residual still large has no
+            # root in it (e.g. a trajectory radius too small), give up on those
+            keep &= hi_a - lo_a > 1e-3 * tol
+        tret[active[keep]] = new[keep]
+        active = active[keep]
+
+    info = {
+        "converged": int(converged.sum()),
+        "cells": tret.size,
+        "iterations": sweeps,
+        "cell_iterations": iters.reshape(shape),
+    }
+    return tret.reshape(shape), info
+
+
+def radiation_field(
+    X,
+    Y,
+    t,
+    r0=1.5,
+    w0=2.0,
+    q=1.0,
+    c=1.0,
+    method="approx",
+    tol=1e-10,
+    max_iter=50,
+    return_info=False,
+    trajectory=None,
+):
+    """
+    Radiated field of a point charge circling the origin, evaluated on the grid X, Y.
+
+    t can be a single time or a 1D array of frame times. For an array the result has
+    shape (len(t), *X.shape), one field per frame.
+    method="approx" uses the non-iterative retarded time t' = t - |r - r'(t)|/c, like
+    the old loop did. "fixed_point" and "newton" solve for the exact retarded time with
+    solve_retarded_time(). Cells closer than 0.05 to the retarded position are zeroed.
+    With return_info=True the solver report is returned as well (None for "approx").
+    trajectory replaces the circle of r0, w0 by any path from trajectory.py; a
+    TrajectoryTable keeps the per-cell lookups down to array gathers.
+    """
+    if trajectory is None:
+        trajectory = Circle(r0, w0)
+    info = None
+    if method == "approx":
+        t = _frame_axis(t, X)
+        xp, yp = trajectory.position(t)
+        dx = X - xp
+        dy = Y - yp
+        r_dist = np.sqrt(dx**2 + dy**2)
+        tret = t - r_dist / c
+    else:
+        tret, info = solve_retarded_time(
+            X,
+            Y,
+            t,
+            c=c,
+            method=method,
+            tol=tol,
+            max_iter=max_iter,
+            trajectory=trajectory,
+        )
+
+    # Particle position and acceleration at retarded time
+    (xpr, ypr), (ax, ay) = trajectory.position_acceleration(tret)
+    dxr = X - xpr
+    dyr = Y - ypr
+    r_retdist = np.sqrt(dxr**2 + dyr**2)
+    # Project acceleration onto direction to observer
+    r_hat_x = dxr / (r_retdist + 1e-8)
+    r_hat_y = dyr / (r_retdist + 1e-8)
+    a_proj = ax * r_hat_x + ay * r_hat_y
+    # Field: E ~ (q a_proj) / r, cut off right at the source
+    E = q * a_proj / (r_retdist + 1e-8)
+    E[r_retdist <= 0.05] = 0.0
+    if return_info:
+        return E, info
+    return E
+
+
+def radiation_field_tiled(
+    X,
+    Y,
+    t,
+    r0=1.5,
+    w0=2.0,
+    q=1.0,
+    c=1.0,
+    method="approx",
+    tol=1e-10,
+    max_iter=50,
+    tile=256,
+    dtype=np.float32,
+    out=None,
+    return_info=False,
+    trajectory=None,
+):
+    """
+    radiation_field() with bounded memory, for big grids and many frames.
+
+    The grid is done in tile x tile blocks, one frame at a time. All temporaries
+    live in a fixed set of tile-sized scratch buffers of the given dtype, filled
+    through the ufuncs' out= arguments, so peak memory is the output plus a few
+    tiles. The exact retarded time methods still allocate their per-tile solver
+    state.
+    The result is written into out, shape (len(t), *X.shape) for an array t or
+    X.shape for a single t, e.g. a preallocated array or an np.memmap. Without out
+    a new array of dtype is returned.
+    With return_info=True the solver reports of all tiles are added up (None for
+    "approx"), without the per-cell iteration counts.
+    The circle of r0, w0 is done entirely in the scratch buffers, another
+    trajectory allocates its tile-sized position and acceleration lookups.
+    """
+    if trajectory is None:
+        trajectory = Circle(r0, w0)
+    # The circle's position and acceleration are computed in place
+    circle = type(trajectory) is Circle
+    if circle:
+        r0, w0 = trajectory.r0, trajectory.w0
+    scalar = np.ndim(t) == 0
+    t_vals = np.atleast_1d(np.asarray(t, dtype=float))
+    if out is None:
+        out = np.empty(np.shape(t) + X.shape, dtype=dtype)
+    frames = out[None] if scalar else out
+
+    # Scratch: grid x, grid y, two coordinate differences, distance, retarded
+    # time, two retarded positions
+    gx, gy, dx, dy, dist, tret, xpr, ypr = np.empty((8, tile, tile), dtype=dtype)
+    near = np.empty((tile, tile), dtype=bool)
+    info = None
+    if method != "approx":
+        info = {"converged": 0, "cells": 0, "iterations": 0}
+
+    ny, nx = X.shape
+    for i, ti in enumerate(t_vals):
+        for y_start in range(0, ny, tile):
+            for x_start in range(0, nx, tile):
+                rows = slice(y_start, y_start + tile)
+                cols = slice(x_start, x_start + tile)
+                h, w = X[rows, cols].shape
+                gx_, gy_, dx_, dy_, dist_, tret_, xpr_, ypr_ = (
+                    buf[:h, :w] for buf in (gx, gy, dx, dy, dist, tret, xpr, ypr)
+                )
+                near_ = near[:h, :w]
+                np.copyto(gx_, X[rows, cols], casting="same_kind")
+                np.copyto(gy_, Y[rows, cols], casting="same_kind")
+
+                if method == "approx":
+                    # t' = t - |r - r'(t)|/c
+                    xp, yp = trajectory.position(ti)
+                    np.subtract(gx_, xp, out=dx_)
+                    np.subtract(gy_, yp, out=dy_)
+                    _distance(dx_, dy_, dist_, scratch=tret_)
+                    np.divide(dist_, c, out=tret_)
+                    np.subtract(ti, tret_, out=tret_)
+                else:
+                    solved, tile_info = solve_retarded_time(
+                        X[rows, cols],
+                        Y[rows, cols],
+                        ti,
+                        c=c,
+                        method=method,
+                        tol=tol,
+                        max_iter=max_iter,
+                        trajectory=trajectory,
+                    )
+                    np.copyto(tret_, solved, casting="same_kind")
+                    info["converged"] += tile_info["converged"]
+                    info["cells"] += tile_info["cells"]
+                    info["iterations"] = max(
+                        info["iterations"], tile_info["iterations"]
+                    )
+
+                # Particle position at retarded time
+                if circle:
+                    np.multiply(tret_, w0, out=xpr_)
+                    np.sin(xpr_, out=ypr_)
+                    np.cos(xpr_, out=xpr_)
+                    np.multiply(xpr_, r0, out=xpr_)
+                    np.multiply(ypr_, r0, out=ypr_)
+                else:
+                    (px, py), (ax, ay) = trajectory.position_acceleration(tret_)
+                    np.copyto(xpr_, px, casting="same_kind")
+                    np.copyto(ypr_, py, casting="same_kind")
+                np.subtract(gx_, xpr_, out=dx_)
+                np.subtract(gy_, ypr_, out=dy_)
+                _distance(dx_, dy_, dist_, scratch=tret_)
+                np.less_equal(dist_, 0.05, out=near_)
+                # a (-w0^2 r'(t') on the circle) projected onto the direction to
+                # the observer, E ~ (q a_proj) / r
+                np.add(dist_, 1e-8, out=dist_)
+                if circle:
+                    np.multiply(xpr_, -(w0**2), out=xpr_)
+                    np.multiply(ypr_, -(w0**2), out=ypr_)
+                else:
+                    np.copyto(xpr_, ax, casting="same_kind")
+                    np.copyto(ypr_, ay, casting="same_kind")
+                np.divide(dx_, dist_, out=dx_)
+                np.divide(dy_, dist_, out=dy_)
+                np.multiply(xpr_, dx_, out=xpr_)
+                np.multiply(ypr_, dy_, out=ypr_)
+                np.add(xpr_, ypr_, out=xpr_)
+                np.multiply(xpr_, q, out=xpr_)
+                np.divide(xpr_, dist_, out=xpr_)
+                xpr_[near_] = 0.0
+                frames[i, rows, cols] = xpr_
+
+    if return_info:
+        return out, info
+    return out
+
+
+def _distance(dx, dy, out, scratch):
+    # sqrt(dx**2 + dy**2) into out, dx and dy are left alone
+    np.multiply(dx, dx, out=out)
+    np.multiply(dy, dy, out=scratch)
+    np.add(out, scratch, out=out)
+    np.sqrt(out, out=out)
@@ -0,0 +1,232 @@
+import argparse
+import itertools
+import json
+import os
+from functools import partial
+
+import numpy as np
+
+from .field_cube import create_cube
+from .frame_pool import map_frames
+from .retarded_field import radiation_field, radiation_field_tiled
+
+# Parameter sweeps of the circling-charge radiation field (2D_fun.py), without
+# any plotting. Every point of a sweep is a set of r0, w0, q and c, evaluated
+# on one shared observer grid and reduced to a few numbers:
+#   peak_field  largest |E| over all frames and cells
+#   power       c <E^2> 2 pi R on a ring of radius R around the source,
+#               averaged over the frames, a proxy for the radiated power
+#   angular     the time averaged E^2 on that ring in num_angles sectors
+#               (counterclockwise from -pi), normalized to sum to 1
+# The field is linear in q, so points that only differ in q share one field
+# evaluation. Groups of points run in a process pool (see frame_pool.py).
+#
+#   python -m fieldsim.sweep --r0 1 1.5 2 --w0 1 2 --workers 4 --out sweep.json
+
+
+class SweepGrid:
+    """
+    Observer grid shared by all points of a sweep.
+
+    x and y are the grid axes. The ring of cells within half a grid spacing of
+    radius ring (default 80% of the way to the nearest edge) is binned into
+    num_angles sectors for the power and angular summaries. Pickling only
+    sends the axes, workers rebuild the rest.
+    """
+
+    def __init__(self, x, y, ring=None, num_angles=36):
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.X, self.Y = np.meshgrid(self.x, self.y)
+        if ring is None:
+            ring = 0.8 * min(np.abs(self.x).max(), np.abs(self.y).max())
+        self.ring = ring
+        self.num_angles = num_angles
+        R = np.hypot(self.X, self.Y).ravel()
+        spacing = max(np.abs(np.diff(self.x)).max(), np.abs(np.diff(self.y)).max())
+        self.ring_cells = np.flatnonzero(np.abs(R - ring) <= spacing / 2)
+        if len(self.ring_cells) == 0:
+            raise ValueError(f"No grid cells at radius {ring}")
+        angle = np.arctan2(self.Y, self.X).ravel()[self.ring_cells]
+        sector = (angle + np.pi) * (num_angles / (2 * np.pi))
+        self.ring_bins = sector.astype(np.intp) % num_angles
+        self.bin_counts = np.bincount(self.ring_bins, minlength=num_angles)
+
+    def __reduce__(self):
+        return SweepGrid, (self.x, self.y, self.ring, self.num_angles)
+
+
+def parameter_grid(r0=(1.5,), w0=(2.0,), q=(1.0,), c=(1.0,)):
+    """Every combination of the given values, as a list of dicts with r0, w0, q, c."""
+    return [
+        dict(r0=a, w0=b, q=d, c=e) for a, b, d, e in itertools.product(r0, w0, q, c)
+    ]
+
+
+def cube_name(point):
+    """Directory name of a point's field cube, e.g. "r0=1.5_w0=2_q=1_c=1"."""
+    return "_".join(f"{key}={point[key]:g}" for key in ("r0", "w0", "q", "c"))
+
+
+def _sweep_group(grid, t_vals, method, tile, window, cube_dir, group):
+    # One field evaluation per frame window for all q's of the group
+    (r0, w0, c), qs = group
+    if tile:
+        evaluate = partial(
+            radiation_field_tiled, grid.X, grid.Y, tile=tile, dtype=np.float32
+        )
+    else:
+        evaluate = partial(radiation_field, grid.X, grid.Y)
+    cubes = []
+    if cube_dir:
+        for q in qs:
+            point = dict(r0=r0, w0=w0, q=q, c=c)
+            cubes.append(
+                create_cube(
+                    os.path.join(cube_dir, cube_name(point)),
+                    (len(t_vals), *grid.X.shape),
+                    ("t", "y", "x"),
+                    coords=dict(t=t_vals, y=grid.y, x=grid.x),
+                    dtype=np.float32,
+                    method=method,
+                    **point,
+                )
+            )
+
+    peak = 0.0
+    ring_sq = np.zeros(grid.num_angles)
+    for start in range(0, len(t_vals), window):
+        t_chunk = t_vals[start : start + window]
+        E = evaluate(t_chunk, r0=r0, w0=w0, q=1.0, c=c, method=method)
+        peak = max(peak, float(np.abs(E).max()))
+        ring = E.reshape(len(t_chunk), -1)[:, grid.ring_cells]
+        ring_sq += np.bincount(
+            grid.ring_bins, weights=(ring**2).sum(axis=0), minlength=grid.num_angles
+        )
+        for cube, q in zip(cubes, qs):
+            cube[start : start + len(t_chunk)] = q * E
+    for cube in cubes:
+        cube.close()
+
+    # Mean E^2 per sector, over frames and the sector's cells
+    mean_sq = ring_sq / (len(t_vals) * np.maximum(grid.bin_counts, 1))
+    total = mean_sq.sum()
+    angular = mean_sq / total if total > 0 else mean_sq
+    power = c * mean_sq[grid.bin_counts > 0].mean() * 2 * np.pi * grid.ring
+    return [
+        dict(
+            r0=r0,
+            w0=w0,
+            q=q,
+            c=c,
+            peak_field=abs(q) * peak,
+            power=q**2 * power,
+            angular=angular.tolist(),
+        )
+        for q in qs
+    ]
+
+
+def sweep(
+    points,
+    x=None,
+    y=None,
+    t_vals=None,
+    method="approx",
+    tile=None,
+    frame_window=16,
+    workers=1,
+    cube_dir=None,
+    ring=None,
+    num_angles=36,
+):
+    """
+    Summaries of the radiation field for every point (dict with r0, w0, q, c).
+
+    The grid and times default to those of 2D_fun.py: 200 x 200 cells on
+    [-10, 10]^2 and 80 frames over t in [0, 6]. Frames are evaluated
+    frame_window at a time, or tile by tile with tile set (see
+    radiation_field_tiled). With workers > 1 the points are spread over a
+    process pool. cube_dir saves every point's field series as a field cube
+    named by cube_name(). Returns one summary dict per point, in order.
+    """
+    if x is None:
+        x = np.linspace(-10, 10, 200)
+    if y is None:
+        y = x
+    if t_vals is None:
+        t_vals = np.linspace(0, 6, 80)
+    t_vals = np.asarray(t_vals, dtype=float)
+    grid = SweepGrid(x, y, ring=ring, num_angles=num_angles)
+    if cube_dir:
+        os.makedirs(cube_dir, exist_ok=True)
+
+    groups = {}
+    for point in points:
+        key = (point["r0"], point["w0"], point["c"])
+        qs = groups.setdefault(key, [])
+        if point["q"] not in qs:
+            qs.append(point["q"])
+    run = partial(_sweep_group, grid, t_vals, method, tile, frame_window, cube_dir)
+    summaries = {}
+    for results in map_frames(run, groups.items(), workers=workers):
+        for summary in results:
+            key = tuple(summary[k] for k in ("r0", "w0", "q", "c"))
+            summaries[key] = summary
+    return [summaries[tuple(p[k] for k in ("r0", "w0", "q", "c"))] for p in points]
+
+
+def format_table(summaries):
+    """Summaries as a text table, with the direction of the strongest sector."""
+    lines = [
+        f"{'r0':>7} {'w0':>7} {'q':>7} {'c':>7} {'peak':>10} {'power':>10} "
+        f"{'max at':>7}"
+    ]
+    for s in summaries:
+        sectors = len(s["angular"])
+        strongest = (np.argmax(s["angular"]) + 0.5) * 360 / sectors - 180
+        lines.append(
+            f"{s['r0']:7g} {s['w0']:7g} {s['q']:7g} {s['c']:7g} "
+            f"{s['peak_field']:10.4g} {s['power']:10.4g} {strongest:6.0f}°"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Sweep the circling-charge radiation field over parameters."
+    )
+    for name, default in (("r0", 1.5), ("w0", 2.0), ("q", 1.0), ("c", 1.0)):
+        parser.add_argument(f"--{name}", type=float, nargs="+", default=[default])
+    parser.add_argument("--grid-size", type=int, default=200)
+    parser.add_argument("--frames", type=int, default=80)
+    parser.add_argument("--t-max", type=float, default=6.0)
+    parser.add_argument("--method", default="approx")
+    parser.add_argument("--tile", type=int)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--angles", type=int, default=36)
+    parser.add_argument("--cubes", help="directory to save every field series in")
+    parser.add_argument("--out", help="write the summaries to this JSON file")
+    args = parser.parse_args(argv)
+
+    points = parameter_grid(args.r0, args.w0, args.q, args.c)
+    x = np.linspace(-10, 10, args.grid_size)
+    t_vals = np.linspace(0, args.t_max, args.frames)
+    summaries = sweep(
+        points,
+        x=x,
+        t_vals=t_vals,
+        method=args.method,
+        tile=args.tile,
+        workers=args.workers,
+        cube_dir=args.cubes,
+        num_angles=args.angles,
+    )
+    print(format_table(summaries))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(dict(x=x.tolist(), t=t_vals.tolist(), results=summaries), f)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+# Paths of the radiating charge for retarded_field.py.
+# A trajectory gives the position, velocity and acceleration at any array of
+# times, as (x, y) pairs of arrays. Circle is the original circular motion;
+# LinearOscillator and FigureEight are other closed forms. FunctionTrajectory
+# wraps any vectorized position function, with finite differences for the
+# derivatives. TrajectoryTable holds position, velocity and acceleration on a
+# dense uniform time grid, so looking them up at millions of retarded times is
+# a couple of array gathers, whatever the path came from: measured samples
+# (from_samples) or another trajectory (tabulate).
+#
+# Every trajectory also has a radius, an upper bound of its distance from the
+# origin, which brackets the retarded time in the exact solvers, and key(), the
+# parameters identifying it for result_cache.py (None if it can't be keyed).
+
+
+class Trajectory(ABC):
+    """
+    Base class of the charge trajectories.
+
+    Subclasses implement position() and velocity() and acceleration() (all
+    vectorized over t) and set radius. position_acceleration() can be
+    overridden when both together are cheaper than separately.
+    """
+
+    radius = None
+
+    @abstractmethod
+    def position(self, t):
+        """(x, y) at the times t."""
+
+    @abstractmethod
+    def velocity(self, t):
+        """(vx, vy) at the times t."""
+
+    @abstractmethod
+    def acceleration(self, t):
+        """(ax, ay) at the times t."""
+
+    def position_acceleration(self, t):
+        """(position(t), acceleration(t)), the two the field needs."""
+        return self.position(t), self.acceleration(t)
+
+    def key(self):
+        """Parameters identifying the trajectory, for cache keys."""
+        return None
+
+
+class Circle(Trajectory):
+    """Circle of radius r0 around the origin, angular frequency w0."""
+
+    def __init__(self, r0=1.5, w0=2.0):
+        self.r0 = r0
+        self.w0 = w0
+        self.radius = abs(r0)
+
+    def position(self, t):
+        return self.r0 * np.cos(self.w0 * t), self.r0 * np.sin(self.w0 * t)
+
+    def velocity(self, t):
+        r0, w0 = self.r0, self.w0
+        return -r0 * w0 * np.sin(w0 * t), r0 * w0 * np.cos(w0 * t)
+
+    def acceleration(self, t):
+        return self.position_acceleration(t)[1]
+
+    def position_acceleration(self, t):
+        # Towards the center: a = -w0^2 r
+        x, y = self.position(t)
+        return (x, y), (-(self.w0**2) * x, -(self.w0**2) * y)
+
+    def key(self):
+        return dict(kind="circle", r0=self.r0, w0=self.w0)
+
+
+class LinearOscillator(Trajectory):
+    """Harmonic oscillation amplitude * cos(w0 t) along direction through the origin."""
+
+    def __init__(self, amplitude=1.5, w0=2.0, direction=(1.0, 0.0)):
+        self.amplitude = amplitude
+        self.w0 = w0
+        direction = np.asarray(direction, dtype=float)
+        self.direction = direction / np.linalg.norm(direction)
+        self.radius = abs(amplitude)
+
+    def _along(self, s):
+        return self.direction[0] * s, self.direction[1] * s
+
+    def position(self, t):
+        return self._along(self.amplitude * np.cos(self.w0 * t))
+
+    def velocity(self, t):
+        return self._along(-self.amplitude * self.w0 * np.sin(self.w0 * t))
+
+    def acceleration(self, t):
+        return self._along(-self.amplitude * self.w0**2 * np.cos(self.w0 * t))
+
+    def key(self):
+        return dict(
+            kind="linear",
+            amplitude=self.amplitude,
+            w0=self.w0,
+            direction=self.direction,
+        )
+
+
+class FigureEight(Trajectory):
+    """Figure-eight (a sin(w0 t), a sin(2 w0 t) / 2), crossing at the origin."""
+
+    def __init__(self, a=1.5, w0=2.0):
+        self.a = a
+        self.w0 = w0
+        # |r|^2 = a^2 s^2 (1 + c^2) with s = sin, c = cos peaks at s^2 = 1
+        self.radius = abs(a)
+
+    def position(self, t):
+        a, w = self.a, self.w0
+        return a * np.sin(w * t), 0.5 * a * np.sin(2 * w * t)
+
+    def velocity(self, t):
+        a, w = self.a, self.w0
+        return a * w * np.cos(w * t), a * w * np.cos(2 * w * t)
+
+    def acceleration(self, t):
+        a, w = self.a, self.w0
+        return -a * w**2 * np.sin(w * t), -2 * a * w**2 * np.sin(2 * w * t)
+
+    def key(self):
+        return dict(kind="figure_eight", a=self.a, w0=self.w0)
+
+
+class FunctionTrajectory(Trajectory):
+    """
+    Trajectory of a vectorized function position(t) -> (x, y).
+
+    velocity and acceleration are optional functions of the same kind,
+    otherwise central differences with step h are used. radius bounds the
+    distance from the origin; without it, it's estimated by sampling the path
+    over span = (t_min, t_max). That estimate only holds inside span, and the
+    retarded times reach back to t - (|r| + radius)/c, so evaluating the path
+    outside span then raises a ValueError rather than letting the exact
+    solvers bracket the wrong times. For worker processes the functions have to be
+    picklable, i.e. module-level functions. Not cacheable (key() is None), use
+    TrajectoryTable.tabulate() for that, which is also faster to evaluate.
+    """
+
+    def __init__(
+        self, position, velocity=None, acceleration=None, radius=None, span=None, h=1e-4
+    ):
+        self._position = position
+        self._velocity = velocity
+        self._acceleration = acceleration
+        self.h = h
+        # Where radius is known to hold, None when it was given
+        self.span = None
+        if radius is None:
+            if span is None:
+                raise ValueError("Need the radius or a span to estimate it from")
+            x, y = position(np.linspace(*span, 10001))
+            # A little headroom for the path between the samples
+            radius = 1.01 * float(np.sqrt(np.max(np.square(x) + np.square(y))))
+            self.span = (float(span[0]), float(span[1]))
+        self.radius = radius
+
+    def _check_span(self, t):
+        if self.span is None or np.size(t) == 0:
+            return
+        t_min, t_max = np.min(t), np.max(t)
+        if t_min < self.span[0] or t_max > self.span[1]:
+            raise ValueError(
+                f"Path evaluated at t in [{t_min:.4g}, {t_max:.4g}], outside the "
+                f"span {self.span} its radius was estimated over; pass a span "
+                "covering the retarded times, or the radius"
+            )
+
+    def position(self, t):
+        self._check_span(t)
+        return self._position(t)
+
+    def velocity(self, t):
+        self._check_span(t)
+        if self._velocity is not None:
+            return self._velocity(t)
+        (x0, y0), (x1, y1) = self._position(t - self.h), self._position(t + self.h)
+        return (x1 - x0) / (2 * self.h), (y1 - y0) / (2 * self.h)
+
+    def acceleration(self, t):
+        if self._acceleration is not None:
+            return self._acceleration(t)
+        return self.position_acceleration(t)[1]
+
+    def position_acceleration(self, t):
+        self._check_span(t)
+        x, y = self._position(t)
+        if self._acceleration is not None:
+            return (x, y), self._acceleration(t)
+        (x0, y0), (x1, y1) = self._position(t - self.h), self._position(t + self.h)
+        h2 = self.h**2
+        return (x, y), ((x1 - 2 * x + x0) / h2, (y1 - 2 * y + y0) / h2)
+
+
+class TrajectoryTable(Trajectory):
+    """
+    Position, velocity and acceleration tabulated at t0 + i * dt.
+
+    Each quantity is an array of num + 1 values, looked up with linear
+    interpolation. With period set the table covers one period (its last entry
+    equal to the first) and times wrap around, otherwise times outside the table
+    are clamped to its ends. Build one with from_samples() or tabulate().
+    """
+
+    _NAMES = ("x", "y", "vx", "vy", "ax", "ay")
+
+    def __init__(self, t0, dt, x, y, vx, vy, ax, ay, period=None):
+        self.t0 = float(t0)
+        self.dt = float(dt)
+        self.period = period
+        self.values = {}
+        self._deltas = {}
+        for name, value in zip(self._NAMES, (x, y, vx, vy, ax, ay)):
+            value = np.ascontiguousarray(value, dtype=float)
+            self.values[name] = value
+            # value[i] + f * delta[i] is one gather per array and an fma
+            self._deltas[name] = np.append(np.diff(value), 0.0)
+        self._num = len(self.values["x"]) - 1
+        if self._num < 1:
+            raise ValueError("A trajectory table needs at least two entries")
+        # Linear interpolation never leaves the convex hull of the entries
+        self.radius = float(
+            np.sqrt(np.max(self.values["x"] ** 2 + self.values["y"] ** 2))
+        )
+
+    @classmethod
+    def tabulate(cls, trajectory, t_min, t_max, dt, period=None):
+        """
+        Table of another trajectory on [t_min, t_max] with step dt.
+
+        With period set the table covers [t_min, t_min + period] and wraps.
+        """
+        if period is not None:
+            t_max = t_min + period
+        num = max(int(np.ceil((t_max - t_min) / dt)), 1)
+        t = np.linspace(t_min, t_max, num + 1)
+        (x, y), (ax, ay) = trajectory.position_acceleration(t)
+        vx, vy = trajectory.velocity(t)
+        return cls(t_min, t[1] - t[0], x, y, vx, vy, ax, ay, period=period)
+
+    @classmethod
+    def from_samples(cls, t, x, y, dt=None, period=None):
+        """
+        Table of a sampled path, e.g. a measured trajectory.
+
+        The samples (t increasing, not necessarily uniform) are joined by the
+        cubic spline through them, twice continuously differentiable so the
+        acceleration has no jumps at the samples, and its position, velocity and
+        acceleration are tabulated every dt (default: a quarter of the smallest
+        sample spacing). The spline is natural (no acceleration) at the ends;
+        for a periodic path pass period and one period of at least three
+        samples, without the repeated end point, and it is periodic instead.
+        """
+        t = np.asarray(t, dtype=float)
+        points = np.stack([np.asarray(x, dtype=float), np.asarray(y, dtype=float)])
+        if t.ndim != 1 or points.shape[1:] != t.shape or len(t) < 2:
+            raise ValueError("Need at least two samples, one t per x and y")
+        if np.any(np.diff(t) <= 0):
+            raise ValueError("Sample times have to be increasing")
+        if period is not None:
+            if len(t) < 3:
+                raise ValueError("A periodic path needs at least three samples")
+            if t[-1] - t[0] >= period:
+                raise ValueError("The samples have to span less than one period")
+        if dt is None:
+            spacing = np.diff(np.append(t, t[0] + period) if period is not None else t)
+            dt = spacing.min() / 4
+        t_end = t[0] + period if period is not None else t[-1]
+        num = max(int(np.ceil((t_end - t[0]) / dt)), 1)
+        grid = np.linspace(t[0], t_end, num + 1)
+        (x, y), (vx, vy), (ax, ay) = _cubic_spline(t, points, grid, period)
+        return cls(t[0], grid[1] - grid[0], x, y, vx, vy, ax, ay, period=period)
+
+    def _locate(self, t):
+        # Table index and fraction of every t
+        s = (np.asarray(t, dtype=float) - self.t0) * (1.0 / self.dt)
+        if self.period is None:
+            s = np.clip(s, 0, self._num)
+        else:
+            s = np.mod(s, self._num)
+        i = np.minimum(s.astype(np.intp), self._num - 1)
+        return i, s - i
+
+    def _lookup(self, i, f, *names):
+        return tuple(
+            np.take(self.values[name], i) + f * np.take(self._deltas[name], i)
+            for name in names
+        )
+
+    def position(self, t):
+        return self._lookup(*self._locate(t), "x", "y")
+
+    def velocity(self, t):
+        return self._lookup(*self._locate(t), "vx", "vy")
+
+    def acceleration(self, t):
+        return self._lookup(*self._locate(t), "ax", "ay")
+
+    def position_acceleration(self, t):
+        x, y, ax, ay = self._lookup(*self._locate(t), "x", "y", "ax", "ay")
+        return (x, y), (ax, ay)
+
+    def key(self):
+        return dict(
+            kind="table", t0=self.t0, dt=self.dt, period=self.period, **self.values
+        )
+
+
+def _solve_tridiagonal(lower, diag, upper, rhs):
+    # Thomas algorithm for lower[i] u[i-1] + diag[i] u[i] + upper[i] u[i+1] =
+    # rhs[i] (lower[0] and upper[-1] unused), rhs of shape (n, ...)
+    n = len(diag)
+    c = np.empty(n)
+    d = np.empty(rhs.shape)
+    c[0] = upper[0] / diag[0]
+    d[0] = rhs[0] / diag[0]
+    for i in range(1, n):
+        denom = diag[i] - lower[i] * c[i - 1]
+        c[i] = upper[i] / denom
+        d[i] = (rhs[i] - lower[i] * d[i - 1]) / denom
+    for i in range(n - 2, -1, -1):
+        d[i] -= c[i] * d[i + 1]
+    return d
+
+
+def _spline_moments(h, slopes, periodic):
+    # Second derivatives M at the knots of the cubic spline with segment lengths
+    # h and chord slopes: h[i-1] M[i-1] + 2 (h[i-1] + h[i]) M[i] + h[i] M[i+1]
+    # = 6 (slopes[i] - slopes[i-1]). Natural ends have M = 0, periodic knots
+    # wrap around (one knot per segment then)
+    if not periodic:
+        moments = np.zeros((len(h) + 1,) + slopes.shape[1:])
+        if len(h) > 1:
+            moments[1:-1] = _solve_tridiagonal(
+                h[:-1],
+                2 * (h[:-1] + h[1:]),
+                h[1:],
+                6 * (slopes[1:] - slopes[:-1]),
+            )
+        return moments
+    h_prev = np.roll(h, 1)
+    lower, diag, upper = h_prev, 2 * (h_prev + h), h
+    rhs = 6 * (slopes - np.roll(slopes, 1, axis=0))
+    # Cyclic system: the tridiagonal part plus the corner terms lower[0] and
+    # upper[-1] as a rank one update (Sherman-Morrison)
+    gamma = -diag[0]
+    diag = diag.copy()
+    diag[0] -= gamma
+    diag[-1] -= upper[-1] * lower[0] / gamma
+    u = np.zeros(len(h))
+    u[0], u[-1] = gamma, upper[-1]
+    y = _solve_tridiagonal(lower, diag, upper, rhs)
+    z = _solve_tridiagonal(lower, diag, upper, u)
+    v_y = y[0] + lower[0] / gamma * y[-1]
+    v_z = z[0] + lower[0] / gamma * z[-1]
+    return y - np.multiply.outer(z, v_y / (1 + v_z))
+
+
+def _cubic_spline(t, points, grid, period=None):
+    # C2 cubic spline through points (2, n) at t, natural or with period;
+    # value and first two derivatives at grid
+    points = points.T
+    if period is not None:
+        # The first sample again one period later closes the loop
+        t = np.append(t, t[0] + period)
+        points = np.concatenate([points, points[:1]])
+    h = np.diff(t)
+    slopes = np.diff(points, axis=0) / h[:, None]
+    moments = _spline_moments(h, slopes, period is not None)
+    if period is not None:
+        moments = np.concatenate([moments, moments[:1]])
+
+    i = np.clip(np.searchsorted(t, grid, side="right") - 1, 0, len(t) - 2)
+    h = h[i][:, None]
+    a = (t[i + 1] - grid)[:, None]
+    b = (grid - t[i])[:, None]
+    m0, m1 = moments[i], moments[i + 1]
+    c0 = points[i] / h - m0 * h / 6
+    c1 = points[i + 1] / h - m1 * h / 6
+    value = (m0 * a**3 + m1 * b**3) / (6 * h) + c0 * a + c1 * b
+    first = (m1 * b**2 - m0 * a**2) / (2 * h) + c1 - c0
+    second = (m0 * a + m1 * b) / h
+    return tuple(value.T), tuple(first.T), tuple(second.T)
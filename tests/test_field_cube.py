@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from fieldsim.field_cube import create_cube, open_cube
+from fieldsim.trajectory import Circle, TrajectoryTable
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "cube")
+    t = np.linspace(0, 1, 4)
+    x = np.linspace(-1, 1, 3)
+    phase_amps = [0.5, np.exp(-1j * np.pi / 2), 1 + 2j]
+    table = TrajectoryTable.tabulate(Circle(), 0.0, None, 0.5, period=np.pi)
+    field = np.arange(24, dtype=np.float32).reshape(4, 3, 2)
+    with create_cube(
+        path,
+        field.shape,
+        ("t", "x", "component"),
+        coords=dict(t=t, x=x, component=["y", "z"]),
+        c=1.0,
+        k_values=[1, 2.5],
+        phase_amps=phase_amps,
+        trajectory=table.key(),
+        function=None,
+        dtype=np.float32,
+    ) as cube:
+        for i in range(len(t)):
+            cube[i] = field[i]
+
+    cube = open_cube(path)
+    assert isinstance(cube.data, np.memmap)
+    assert cube.data.dtype == np.float32
+    np.testing.assert_array_equal(cube[:], field)
+    assert cube.dims == ["t", "x", "component"]
+    np.testing.assert_array_equal(cube.coords["t"], t)
+    np.testing.assert_array_equal(cube.coords["x"], x)
+    assert list(cube.coords["component"]) == ["y", "z"]
+
+    params = cube.params
+    assert params["c"] == 1.0 and params["k_values"] == [1, 2.5]
+    np.testing.assert_allclose(params["phase_amps"], phase_amps)
+    assert params["function"] is None
+    key = params["trajectory"]
+    assert key.keys() == table.key().keys()
+    for name, value in table.key().items():
+        np.testing.assert_array_equal(key[name], value)
+
+    # r+ writes through to the file
+    with open_cube(path, mode="r+") as cube:
+        cube[0] = -1
+    np.testing.assert_array_equal(open_cube(path)[0], -1)
+
+
+def test_coords_have_to_match_the_axes(tmp_path):
+    with pytest.raises(ValueError):
+        create_cube(str(tmp_path / "cube"), (2, 3), ("t", "x"), coords=dict(x=[0, 1]))
+    with pytest.raises(ValueError):
+        create_cube(str(tmp_path / "cube"), (2, 3), ("t",))
@@ -0,0 +1,32 @@
+import numpy as np
+
+from fieldsim.figure_dicts import segment_colors, segments
+
+
+def test_segments_are_separated_by_gaps():
+    starts = np.array([[0.0, 0.0, 0.0], [1.0, 1.0, 1.0]])
+    ends = np.array([[0.0, 2.0, 3.0], [1.0, -1.0, 0.5]])
+    x, y, z = segments(starts, ends)
+    np.testing.assert_array_equal(x, [0, 0, np.nan, 1, 1, np.nan])
+    np.testing.assert_array_equal(y, [0, 2, np.nan, 1, -1, np.nan])
+    np.testing.assert_array_equal(z, [0, 3, np.nan, 1, 0.5, np.nan])
+
+
+def _color_at(scale, value):
+    # The color of the colorscale's flat step that holds value (0 to 1)
+    for (lo, color), (hi, next_color) in zip(scale, scale[1:]):
+        if color == next_color and lo <= value <= hi:
+            return color
+
+
+def test_segment_colors_cycle_per_segment():
+    colors = ["red", "green", "blue"]
+    line = segment_colors(colors, 5)
+    # One value for the start, end and gap of every segment
+    assert len(line["color"]) == 3 * 5
+    values = np.asarray(line["color"]).reshape(5, 3)
+    assert np.all(values == values[:, :1])
+    span = line["cmax"] - line["cmin"]
+    for segment, value in enumerate(values[:, 0]):
+        color = _color_at(line["colorscale"], (value - line["cmin"]) / span)
+        assert color == colors[segment % 3]
@@ -0,0 +1,29 @@
+import os
+import time
+
+import pytest
+
+from fieldsim.frame_pool import map_frames
+
+
+def _slow_square(i):
+    # Later items often finish first
+    time.sleep(0.002 * ((7 * i) % 5))
+    return i * i, os.getpid()
+
+
+@pytest.mark.parametrize("chunksize", [1, 3])
+def test_results_come_back_in_order(chunksize):
+    items = range(40)
+    results = list(
+        map_frames(_slow_square, iter(items), workers=3, chunksize=chunksize)
+    )
+    assert [value for value, _ in results] == [i * i for i in items]
+    # The work really was spread over other processes
+    assert os.getpid() not in {pid for _, pid in results}
+
+
+def test_serial_runs_in_process():
+    results = list(map_frames(_slow_square, range(5), workers=1))
+    assert [value for value, _ in results] == [0, 1, 4, 9, 16]
+    assert {pid for _, pid in results} == {os.getpid()}
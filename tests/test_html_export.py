@@ -0,0 +1,74 @@
+import base64
+import json
+
+import numpy as np
+import pytest
+
+from fieldsim.html_export import CompactHTMLWriter
+
+pytest.importorskip("plotly")
+
+
+def _frame(i, y):
+    trace = {"type": "scatter", "mode": "lines", "x": np.arange(4.0), "y": y}
+    return {"data": [trace], "name": str(i)}
+
+
+def _read_frames(path):
+    # Decode the written file the way its script does
+    text = open(path, encoding="utf-8").read()
+    head, rest = text.split("const buffers = [\n", 1)
+    buffers = [line.strip('",') for line in rest.split("];", 1)[0].split()]
+    spec = json.loads(rest.split("const spec = ", 1)[1].split(";\n", 1)[0])
+    frames = []
+    for i, packed in enumerate(buffers):
+        flat = np.frombuffer(base64.b64decode(packed), dtype=spec["dtype"])
+        data = [dict(trace) for trace in spec["traces"]]
+        offset = 0
+        for (ti, key, shape), start in zip(spec["table"], spec["starts"]):
+            if start > i:
+                continue
+            n = int(np.prod(shape))
+            data[ti][key] = flat[offset : offset + n].reshape(shape)
+            offset += n
+        frames.append(data)
+    return spec, frames
+
+
+def _ys(frames):
+    return [np.asarray(data[0]["y"], dtype=float) for data in frames]
+
+
+def test_window_of_one(tmp_path):
+    path = tmp_path / "out.html"
+    ys = [np.sin(np.arange(4.0) + i) for i in range(5)]
+    with CompactHTMLWriter(path, include_plotlyjs="cdn", window=1) as out:
+        for i, y in enumerate(ys):
+            out.add_frame(_frame(i, y))
+    spec, frames = _read_frames(path)
+    assert spec["names"] == ["0", "1", "2", "3", "4"]
+    np.testing.assert_allclose(_ys(frames), ys, rtol=1e-6)
+
+
+def test_array_changing_after_window(tmp_path):
+    path = tmp_path / "out.html"
+    ys = [np.zeros(4)] * 3 + [np.arange(4.0) * i for i in range(3, 6)]
+    with CompactHTMLWriter(path, include_plotlyjs="cdn", window=2) as out:
+        for i, y in enumerate(ys):
+            out.add_frame(_frame(i, y))
+    spec, frames = _read_frames(path)
+    # x never changes and stays out of the frame buffers
+    assert [entry[:2] for entry in spec["table"]] == [[0, "y"]]
+    assert spec["starts"] == [3]
+    np.testing.assert_allclose(_ys(frames), ys)
+
+
+def test_restyled_trace_raises_and_removes_file(tmp_path):
+    path = tmp_path / "out.html"
+    frame = _frame(1, np.ones(4))
+    frame["data"][0]["mode"] = "markers"
+    with pytest.raises(ValueError, match="styled differently"):
+        with CompactHTMLWriter(path, include_plotlyjs="cdn", window=1) as out:
+            out.add_frame(_frame(0, np.zeros(4)))
+            out.add_frame(frame)
+    assert not path.exists()
@@ -0,0 +1,140 @@
+import numpy as np
+import pytest
+
+from fieldsim.modes import (
+    FFTModeSet,
+    ModeSet,
+    animation_period,
+    lattice_bins,
+    plan_frames,
+    polarization_fields,
+)
+
+T_VALS = np.linspace(0, 3, 7)
+
+
+def _direct_sum(k_values, x, amps, t_vals, pol=None, c=1.0):
+    # sum_n A_n e^{i(k_n x - w_n t)} mode by mode
+    field = 0
+    for n, k in enumerate(k_values):
+        wave = amps[n] * np.exp(1j * (k * x[None] - c * abs(k) * t_vals[:, None]))
+        field = field + (wave if pol is None else wave[..., None] * pol[n])
+    return field
+
+
+def test_fft_matches_direct_1d():
+    # Integer k's on a grid of one wavelength of k = 1 fit the FFT lattice
+    x = np.linspace(-np.pi, np.pi, 50, endpoint=False)
+    k_values = [1, -3, 7, 12]
+    amps = [1.0, 0.5j, 0.3, 0.2 - 0.1j]
+    pol = [(1.0, 0.0), (0.0, 1.0), (0.6, 0.8), (1.0, 0.0)]
+    fft = ModeSet.plane_waves(k_values, x, pol, amps, c=1.5, method="fft")
+    direct = ModeSet.plane_waves(k_values, x, pol, amps, c=1.5, method="direct")
+    assert isinstance(fft, FFTModeSet)
+    assert type(direct) is ModeSet
+    expected = _direct_sum(k_values, x, amps, T_VALS, np.array(pol), c=1.5)
+    np.testing.assert_allclose(direct.evaluate(T_VALS), expected, atol=1e-12)
+    np.testing.assert_allclose(fft.evaluate(T_VALS), expected, atol=1e-12)
+    np.testing.assert_allclose(fft.evaluate(T_VALS[2]), expected[2], atol=1e-12)
+    np.testing.assert_allclose(fft.basis, direct.basis, atol=1e-12)
+    np.testing.assert_allclose(
+        fft.parts(T_VALS, index=3), direct.parts(T_VALS, index=3), atol=1e-12
+    )
+    for a, b in zip(
+        polarization_fields(fft, T_VALS), polarization_fields(direct, T_VALS)
+    ):
+        np.testing.assert_allclose(a, b, atol=1e-12)
+
+
+def test_fft_matches_direct_2d():
+    # Non-integer k's, the lattice is longer than the grid then
+    x = np.linspace(0, 2 * np.pi, 24, endpoint=False)
+    y = np.linspace(0, 2 * np.pi, 18, endpoint=False)
+    k_values = [(1, 0), (0.5, -2), (-3, 1.5)]
+    fft = ModeSet.plane_waves(k_values, (x, y), amps=[1, 2, 0.5j], method="fft")
+    direct = ModeSet.plane_waves(k_values, (x, y), amps=[1, 2, 0.5j])
+    assert isinstance(fft, FFTModeSet)
+    assert fft.sizes[0] > len(x) and fft.sizes[1] > len(y)
+    assert fft.shape == direct.shape == (len(y), len(x))
+    np.testing.assert_allclose(
+        fft.evaluate(T_VALS), direct.evaluate(T_VALS), atol=1e-12
+    )
+
+
+def test_off_lattice_falls_back_to_direct():
+    x = np.linspace(0, 10, 40)
+    k_values = [1.0, np.sqrt(2)]
+    assert lattice_bins(k_values, x, max_size=4 * len(x)) is None
+    modes = ModeSet.plane_waves(k_values, x, method="fft")
+    assert type(modes) is ModeSet
+    # A non-uniform grid has no lattice either
+    assert lattice_bins([1.0], x**2) is None
+
+
+def test_parts_sum_to_field():
+    x = np.linspace(-5, 5, 30)
+    modes = ModeSet.plane_waves([0.5, -1.25, 2.0], x, amps=[1, 0.3, 0.7j])
+    np.testing.assert_allclose(
+        modes.parts(T_VALS).sum(axis=1), modes.evaluate(T_VALS), atol=1e-12
+    )
+    np.testing.assert_allclose(
+        modes.parts(T_VALS, index=4), modes.parts(T_VALS)[:, :, 4], atol=1e-12
+    )
+
+
+@pytest.mark.parametrize("method", ["direct", "fft"])
+def test_single_precision(method):
+    x = np.linspace(-np.pi, np.pi, 64, endpoint=False)
+    k_values = [1, 2, 5]
+    modes = ModeSet.plane_waves(k_values, x, dtype=np.complex64, method=method)
+    exact = ModeSet.plane_waves(k_values, x)
+    field = modes.evaluate(T_VALS)
+    assert field.dtype == np.complex64
+    np.testing.assert_allclose(field, exact.evaluate(T_VALS), atol=1e-5)
+
+
+@pytest.mark.parametrize(
+    "omegas, period",
+    [
+        ([1.0], 2 * np.pi),
+        ([2.0, 3.0], 2 * np.pi),
+        ([1.0, 1.5], 4 * np.pi),  # gcd 0.5
+        ([1.0, -1.0, 2.0], 2 * np.pi),  # signs don't matter
+        ([2.0, 2.0 * (1 + 1e-12)], np.pi),  # equal up to rounding
+        ([0.0, 2.0], np.pi),  # static modes are ignored
+        ([0.0], 2 * np.pi),
+        ([], 2 * np.pi),
+    ],
+)
+def test_animation_period(omegas, period):
+    assert animation_period(omegas) == pytest.approx(period)
+
+
+def test_animation_period_falls_back_to_the_beat():
+    # Commensurate only after 1000 cycles, or not at all
+    assert animation_period([1.0, 1.001]) == pytest.approx(2 * np.pi / 0.001)
+    assert animation_period([1.0, np.sqrt(2)]) == pytest.approx(
+        2 * np.pi / (np.sqrt(2) - 1)
+    )
+    assert animation_period([1.0, 1.001], max_cycles=1000) == pytest.approx(
+        2000 * np.pi
+    )
+
+
+def test_plan_frames():
+    # 24 frames per cycle of the fastest mode over two of its cycles
+    assert plan_frames([1.0, 2.0], 2 * np.pi, 24, 2, 2000) == (48, 2 * np.pi)
+    assert plan_frames([1.0, 2.0], 2 * np.pi, 24, 100, 2000) == (100, 2 * np.pi)
+    assert plan_frames([0.0], 2 * np.pi, 24, 10, 2000) == (10, 2 * np.pi)
+
+
+def test_plan_frames_cap_keeps_the_sampling():
+    omegas = [1.0, 1.001]
+    period = animation_period(omegas)
+    with pytest.warns(UserWarning, match="max_frames"):
+        num_frames, span = plan_frames(omegas, period, 24, 100, 2000)
+    assert num_frames == 2000 and span < period
+    # Whole cycles of the fast mode, each still sampled at least 24 times
+    cycles = span * 1.001 / (2 * np.pi)
+    assert cycles == pytest.approx(round(cycles))
+    assert num_frames / cycles >= 24
@@ -0,0 +1,119 @@
+import os
+
+import numpy as np
+import pytest
+
+from fieldsim.result_cache import ResultCache, store_chunks
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(str(tmp_path / "cache"), max_bytes=1024**2)
+
+
+def test_key_is_stable_and_tells_parameters_apart(cache):
+    key = cache.key("field", x=np.linspace(0, 1, 5), c=1.0, pol=[(1, 0)])
+    assert key == cache.key("field", pol=[(1, 0)], c=1.0, x=np.linspace(0, 1, 5))
+    assert key != cache.key("field", x=np.linspace(0, 1, 5), c=1.5, pol=[(1, 0)])
+    assert key != cache.key("field", x=np.linspace(0, 1, 6), c=1.0, pol=[(1, 0)])
+    assert key != cache.key(
+        "field", x=np.linspace(0, 1, 5, dtype=np.float32), c=1.0, pol=[(1, 0)]
+    )
+    with pytest.raises(TypeError):
+        cache.key(value=object())
+
+
+def test_key_of_dtypes(cache):
+    # Scalar types, dtype instances and dtype classes of one dtype are equal
+    float32 = cache.key(dtype=np.float32)
+    assert cache.key(dtype=np.dtype("float32")) == float32
+    assert cache.key(dtype=type(np.dtype("float32"))) == float32
+    assert cache.key(dtype=np.float64) != float32
+    assert cache.key(dtype=np.complex64) != cache.key(dtype=np.complex128)
+
+
+def test_key_depends_on_the_source(tmp_path):
+    script = tmp_path / "script.py"
+    script.write_text("scale = 1.0\n")
+    before = ResultCache(str(tmp_path / "cache"), source=str(script))
+    script.write_text("scale = 2.0\n")
+    after = ResultCache(str(tmp_path / "cache"), source=str(script))
+    assert before.key("page", n=3) != after.key("page", n=3)
+    assert before.salt["fieldsim"] == after.salt["fieldsim"]
+    assert "plotly" in before.salt
+
+
+def _names(cache):
+    return sorted(os.listdir(cache.root))
+
+
+def test_arrays_and_files_round_trip(cache, tmp_path):
+    key = cache.key("field")
+    assert cache.load(key) is None
+    with cache.entry(key) as entry:
+        entry.array("E", (3, 2), np.float32)[:] = np.arange(6).reshape(3, 2)
+    stored = cache.load(key)
+    np.testing.assert_array_equal(stored["E"], np.arange(6).reshape(3, 2))
+    assert stored["E"].dtype == np.float32
+
+    page = tmp_path / "page.html"
+    page.write_text("<html>")
+    copy = tmp_path / "copy.html"
+    assert not cache.fetch_file(key, str(copy))
+    cache.store_file(key, str(page))
+    assert cache.fetch_file(key, str(copy))
+    assert copy.read_text() == "<html>"
+
+
+def _chunks(num_frames, window=2):
+    for start in range(0, num_frames, window):
+        n = min(window, num_frames - start)
+        yield (np.full((n, 4), start, dtype=float),)
+
+
+def test_store_chunks_commits_complete_runs(cache):
+    key = cache.key("chunks")
+    passed = list(store_chunks(cache, key, _chunks(5), 5, ("E",)))
+    assert len(passed) == 3
+    stored = cache.load(key)["E"]
+    assert stored.shape == (5, 4)
+    np.testing.assert_array_equal(stored[:, 0], [0, 0, 2, 2, 4])
+    assert _names(cache) == [key]
+
+
+def test_store_chunks_drops_incomplete_runs(cache):
+    key = cache.key("chunks")
+    # Fewer frames than announced
+    with pytest.raises(ValueError):
+        list(store_chunks(cache, key, _chunks(3), 5, ("E",)))
+    # The consumer stops early
+    stored = store_chunks(cache, key, _chunks(5), 5, ("E",))
+    next(stored)
+    stored.close()
+
+    # The run itself fails
+    def failing():
+        yield from _chunks(2)
+        raise RuntimeError("interrupted")
+
+    with pytest.raises(RuntimeError):
+        list(store_chunks(cache, key, failing(), 5, ("E",)))
+    assert cache.load(key) is None
+    # No partial entry or temporary directory is left behind
+    assert _names(cache) == []
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=3000)
+    keys = [cache.key("entry", i) for i in range(3)]
+    for i, key in enumerate(keys[:2]):
+        with cache.entry(key) as entry:
+            entry.array("E", (100,), np.float64)  # 928 bytes with the header
+        # Distinct access times regardless of the file system's resolution
+        os.utime(os.path.join(cache.root, key), (1000 + i, 1000 + i))
+    # Using the older entry makes it the most recent one
+    assert cache.load(keys[0]) is not None
+    with cache.entry(keys[2]) as entry:
+        entry.array("E", (200,), np.float64)
+    assert _names(cache) == sorted([keys[0], keys[2]])
+    assert cache.load(keys[1]) is None
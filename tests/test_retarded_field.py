@@ -0,0 +1,142 @@
+import numpy as np
+import pytest
+
+from fieldsim.retarded_field import (
+    radiation_field,
+    radiation_field_tiled,
+    solve_retarded_time,
+)
+from fieldsim.trajectory import Circle, FunctionTrajectory
+
+
+def _loop_field(X, Y, t, r0=1.5, w0=2.0, q=1.0, c=1.0):
+    # The original per-cell loop of 2D_fun.py
+    def particle_pos(t):
+        return r0 * np.cos(w0 * t), r0 * np.sin(w0 * t)
+
+    E = np.zeros_like(X)
+    for ix in range(X.shape[0]):
+        for iy in range(X.shape[1]):
+            xg, yg = X[ix, iy], Y[ix, iy]
+            xp, yp = particle_pos(t)
+            r_dist = np.sqrt((xg - xp) ** 2 + (yg - yp) ** 2)
+            tret = t - r_dist / c
+            xpr, ypr = particle_pos(tret)
+            dxr = xg - xpr
+            dyr = yg - ypr
+            r_retdist = np.sqrt(dxr**2 + dyr**2)
+            ax = -(w0**2) * xpr
+            ay = -(w0**2) * ypr
+            r_hat_x = dxr / (r_retdist + 1e-8)
+            r_hat_y = dyr / (r_retdist + 1e-8)
+            a_proj = ax * r_hat_x + ay * r_hat_y
+            if r_retdist > 0.05:
+                E[ix, iy] = q * a_proj / (r_retdist + 1e-8)
+            else:
+                E[ix, iy] = 0.0
+    return E
+
+
+def _grid(n=13, extent=4.0):
+    x = np.linspace(-extent, extent, n)
+    return np.meshgrid(x, x)
+
+
+T_VALS = np.array([0.0, 0.7, 2.3])
+
+
+def test_radiation_field_matches_loop():
+    X, Y = _grid()
+    E = radiation_field(X, Y, T_VALS, r0=1.2, w0=1.5, q=0.8, c=1.3)
+    assert E.shape == (len(T_VALS), *X.shape)
+    for t, frame in zip(T_VALS, E):
+        expected = _loop_field(X, Y, t, r0=1.2, w0=1.5, q=0.8, c=1.3)
+        np.testing.assert_allclose(frame, expected, rtol=1e-12, atol=1e-12)
+        np.testing.assert_allclose(
+            radiation_field(X, Y, t, r0=1.2, w0=1.5, q=0.8, c=1.3), expected
+        )
+
+
+@pytest.mark.parametrize("tile", [4, 5, 64])
+def test_radiation_field_tiled_matches_loop(tile):
+    # Tiles that don't divide the grid, and one bigger than it
+    X, Y = _grid()
+    E = radiation_field_tiled(X, Y, T_VALS, tile=tile, dtype=np.float64)
+    for t, frame in zip(T_VALS, E):
+        np.testing.assert_allclose(frame, _loop_field(X, Y, t), atol=1e-12)
+    single = radiation_field_tiled(X, Y, T_VALS[1], tile=tile, dtype=np.float32)
+    assert single.shape == X.shape and single.dtype == np.float32
+    np.testing.assert_allclose(single, _loop_field(X, Y, T_VALS[1]), atol=1e-4)
+
+
+def _residual(X, Y, t, tret, trajectory, c):
+    xp, yp = trajectory.position(tret)
+    return tret - t + np.sqrt((X - xp) ** 2 + (Y - yp) ** 2) / c
+
+
+@pytest.mark.parametrize(
+    "method, trajectory",
+    [
+        ("newton", Circle(1.5, 2.0)),  # faster than c, several roots
+        ("newton", Circle(1.0, 0.5)),
+        ("fixed_point", Circle(1.0, 0.5)),  # only a contraction below c
+    ],
+)
+def test_retarded_time_residual_and_bracket(method, trajectory):
+    X, Y = _grid(n=21, extent=8.0)
+    t = T_VALS[:, None, None]
+    tret, info = solve_retarded_time(
+        X, Y, T_VALS, c=1.0, method=method, trajectory=trajectory
+    )
+    assert info["converged"] == info["cells"] == tret.size
+    assert np.abs(_residual(X, Y, t, tret, trajectory, 1.0)).max() < 1e-8
+    # Between the nearest and farthest the charge can be
+    r_obs = np.sqrt(X**2 + Y**2)
+    assert np.all(tret >= t - (r_obs + trajectory.radius) - 1e-9)
+    assert np.all(tret <= t - np.maximum(r_obs - trajectory.radius, 0.0) + 1e-9)
+
+
+def test_exact_field_uses_solved_retarded_time():
+    X, Y = _grid()
+    circle = Circle(1.0, 0.5)
+    E, info = radiation_field(
+        X, Y, T_VALS, trajectory=circle, method="newton", return_info=True
+    )
+    tret, _ = solve_retarded_time(X, Y, T_VALS, trajectory=circle)
+    (xp, yp), (ax, ay) = circle.position_acceleration(tret)
+    dist = np.sqrt((X - xp) ** 2 + (Y - yp) ** 2)
+    expected = (ax * (X - xp) + ay * (Y - yp)) / (dist + 1e-8) ** 2
+    expected[dist <= 0.05] = 0.0
+    np.testing.assert_allclose(E, expected, atol=1e-12)
+    assert info["converged"] == info["cells"]
+
+    tiled, tiled_info = radiation_field_tiled(
+        X,
+        Y,
+        T_VALS,
+        trajectory=circle,
+        method="newton",
+        tile=6,
+        dtype=np.float64,
+        return_info=True,
+    )
+    np.testing.assert_allclose(tiled, E, atol=1e-12)
+    assert tiled_info["cells"] == info["cells"]
+
+
+@pytest.mark.parametrize("method", ["newton", "fixed_point"])
+def test_unsolved_cells_are_not_converged(method):
+    # An outward spiral with a radius bound that only holds for t < 6: the
+    # bracket misses the root for far away cells, which mustn't count as solved
+    spiral = FunctionTrajectory(
+        lambda t: (0.3 * t * np.cos(t), 0.3 * t * np.sin(t)), radius=1.8
+    )
+    X, Y = _grid(n=41, extent=10.0)
+    t = T_VALS[:, None, None] + 3.0
+    tret, info = solve_retarded_time(
+        X, Y, T_VALS + 3.0, method=method, trajectory=spiral
+    )
+    residual = np.abs(_residual(X, Y, t, tret, spiral, 1.0))
+    assert 0 < info["converged"] < info["cells"]
+    assert info["converged"] <= np.count_nonzero(residual < 1e-10)
+    assert residual.max() > 1.0
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from fieldsim.field_cube import open_cube
+from fieldsim.retarded_field import radiation_field
+from fieldsim.sweep import SweepGrid, cube_name, parameter_grid, sweep
+
+
+def test_shared_q_evaluation_matches_direct_fields(tmp_path):
+    x = np.linspace(-6, 6, 25)
+    X, Y = np.meshgrid(x, x)
+    t_vals = np.linspace(0, 3, 7)
+    # Two q's share one field evaluation per (r0, w0, c)
+    points = parameter_grid(r0=[1.0, 1.5], w0=[2.0], q=[1.0, -2.5], c=[1.0])
+    summaries = sweep(
+        points, x=x, t_vals=t_vals, frame_window=3, cube_dir=str(tmp_path)
+    )
+    assert [(s["r0"], s["q"]) for s in summaries] == [(p["r0"], p["q"]) for p in points]
+    grid = SweepGrid(x, x)
+    for point, summary in zip(points, summaries):
+        E = radiation_field(X, Y, t_vals, **point)
+        assert summary["peak_field"] == pytest.approx(np.abs(E).max())
+        # Mean E^2 per ring sector, straight from this point's own field
+        ring = E.reshape(len(t_vals), -1)[:, grid.ring_cells] ** 2
+        sums = np.bincount(grid.ring_bins, ring.sum(axis=0), grid.num_angles)
+        mean_sq = sums / (len(t_vals) * np.maximum(grid.bin_counts, 1))
+        power = point["c"] * mean_sq[grid.bin_counts > 0].mean() * 2 * np.pi
+        assert summary["power"] == pytest.approx(power * grid.ring)
+        np.testing.assert_allclose(summary["angular"], mean_sq / mean_sq.sum())
+        cube = open_cube(str(tmp_path / cube_name(point)))
+        np.testing.assert_allclose(cube[:], E, rtol=1e-6, atol=1e-6)
+    # Power scales with q^2, the angular distribution not at all
+    a, b = summaries[0], summaries[1]
+    np.testing.assert_allclose(b["power"], 2.5**2 * a["power"])
+    np.testing.assert_allclose(b["angular"], a["angular"])
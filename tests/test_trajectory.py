@@ -0,0 +1,128 @@
+import numpy as np
+import pytest
+
+from fieldsim.retarded_field import radiation_field
+from fieldsim.trajectory import (
+    Circle,
+    FigureEight,
+    FunctionTrajectory,
+    Trajectory,
+    TrajectoryTable,
+)
+
+CIRCLE = Circle(1.5, 2.0)
+PERIOD = np.pi  # 2 pi / w0
+T = np.linspace(-2.0, 9.0, 997)  # Around the table's ends too
+
+
+def _errors(table, trajectory, t=T):
+    return [
+        np.max(
+            np.abs(np.subtract(getattr(table, name)(t), getattr(trajectory, name)(t)))
+        )
+        for name in ("position", "velocity", "acceleration")
+    ]
+
+
+def test_table_matches_circle():
+    table = TrajectoryTable.tabulate(CIRCLE, 0.0, None, 1e-3, period=PERIOD)
+    # Linear interpolation: error about dt^2 / 8 times the next derivative
+    position, velocity, acceleration = _errors(table, CIRCLE)
+    assert position < 1e-6 and velocity < 1e-5 and acceleration < 1e-4
+    (x, y), (ax, ay) = table.position_acceleration(T)
+    np.testing.assert_array_equal(x, table.position(T)[0])
+    np.testing.assert_array_equal(ay, table.acceleration(T)[1])
+    assert table.radius == pytest.approx(CIRCLE.radius)
+
+
+def test_table_clamps_without_period():
+    table = TrajectoryTable.tabulate(CIRCLE, 0.0, 2.0, 1e-2)
+    np.testing.assert_allclose(table.position(-1.0), CIRCLE.position(0.0))
+    np.testing.assert_allclose(table.position(5.0), CIRCLE.position(2.0))
+
+
+def test_table_field_matches_circle():
+    x = np.linspace(-4, 4, 17)
+    X, Y = np.meshgrid(x, x)
+    t_vals = np.array([0.0, 1.1, 4.0])
+    # Slower than c: the retarded time is unique, so both find the same one
+    circle = Circle(1.0, 0.5)
+    table = TrajectoryTable.tabulate(circle, 0.0, None, 1e-3, period=4 * np.pi)
+    for method in ("approx", "newton"):
+        expected = radiation_field(X, Y, t_vals, trajectory=circle, method=method)
+        field = radiation_field(X, Y, t_vals, trajectory=table, method=method)
+        np.testing.assert_allclose(field, expected, atol=1e-4)
+
+
+@pytest.mark.parametrize("uniform", [True, False])
+def test_from_samples_periodic(uniform):
+    t = np.linspace(0, PERIOD, 48, endpoint=False)
+    if not uniform:
+        # Up to 40% of the spacing off the uniform times
+        t[1:] += np.random.default_rng(0).uniform(-0.4, 0.4, 47) * t[1]
+    x, y = CIRCLE.position(t)
+    table = TrajectoryTable.from_samples(t, x, y, dt=1e-3, period=PERIOD)
+    position, velocity, acceleration = _errors(table, CIRCLE)
+    assert position < 1e-4 and velocity < 1e-3 and acceleration < 0.05
+
+
+def test_from_samples_acceleration_is_continuous():
+    # C2 spline: no jump in the acceleration at the samples
+    t = np.array([0.0, 0.3, 1.0, 1.2, 2.0, 2.9, 3.0])
+    x, y = FigureEight().position(t)
+    table = TrajectoryTable.from_samples(t, x, y, dt=1e-4)
+    eps = 2e-4
+    before = np.array(table.acceleration(t[1:-1] - eps))
+    after = np.array(table.acceleration(t[1:-1] + eps))
+    assert np.max(np.abs(after - before)) < 0.05
+
+
+def test_from_samples_natural_ends():
+    # A straight line is reproduced exactly, with no acceleration anywhere
+    t = np.array([0.0, 0.5, 0.7, 2.0, 3.0])
+    table = TrajectoryTable.from_samples(t, 2 * t + 1, -t, dt=0.01)
+    s = np.linspace(0, 3, 101)
+    np.testing.assert_allclose(table.position(s), (2 * s + 1, -s), atol=1e-12)
+    np.testing.assert_allclose(table.velocity(s), (2 + 0 * s, -1 + 0 * s), atol=1e-12)
+    np.testing.assert_allclose(table.acceleration(s), 0, atol=1e-12)
+
+
+def test_from_samples_rejects_bad_samples():
+    with pytest.raises(ValueError):
+        TrajectoryTable.from_samples([0.0, 1.0, 0.5], [0, 1, 2], [0, 1, 2])
+    with pytest.raises(ValueError):
+        TrajectoryTable.from_samples([0.0, 1.0], [0, 1], [0, 1], period=2.0)
+    with pytest.raises(ValueError):
+        TrajectoryTable.from_samples([0.0, 1.0, 2.0], [0, 1, 2], [0, 1, 2], period=2.0)
+
+
+def test_function_trajectory_differences():
+    path = FunctionTrajectory(CIRCLE.position, radius=CIRCLE.radius)
+    assert path.key() is None
+    position, velocity, acceleration = _errors(path, CIRCLE)
+    assert position == 0 and velocity < 1e-6 and acceleration < 1e-3
+
+
+def test_function_trajectory_estimated_radius_only_holds_in_span():
+    spiral = FunctionTrajectory(
+        lambda t: (0.3 * t * np.cos(t), 0.3 * t * np.sin(t)), span=(0, 6)
+    )
+    assert spiral.radius == pytest.approx(1.8, rel=0.02)
+    spiral.position(np.linspace(0, 6, 50))
+    x = np.linspace(-10, 10, 9)
+    X, Y = np.meshgrid(x, x)
+    # The retarded times of far cells are before the span
+    with pytest.raises(ValueError, match="span"):
+        radiation_field(X, Y, 3.0, trajectory=spiral, method="newton")
+
+
+def test_trajectory_is_abstract():
+    class NoAcceleration(Trajectory):
+        def position(self, t):
+            return t, t
+
+        def velocity(self, t):
+            return t, t
+
+    with pytest.raises(TypeError):
+        NoAcceleration()